@@ -1,12 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from shared.database import get_user_by_email, create_user, update_user
-import hashlib
+from fastapi import APIRouter, HTTPException, Request, Response, Header, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional
+from shared.activity import activity
+from shared.async_database import db
+from shared.conditional import not_modified, version_etag
+from shared.database import email_index_is_complete
+from shared.email_index import normalize_email
+from shared.passwords import hasher, needs_rehash
+from shared.sessions import issue_token, require_user
+from shared.user_store import VERSION_KEY
+import asyncio
+import csv
+import json
 import re
+import tempfile
 from datetime import datetime
 
 router = APIRouter()
 
+# Bulk registration: valid rows hashed and committed together, and the longest accepted line
+BULK_BATCH_SIZE = 256
+BULK_MAX_LINE = 16 * 1024
+# Per-row results of a bulk upload are kept in memory up to this size, then spooled to a temp file
+BULK_REPORT_MEMORY = 1024 * 1024
+
 # Request/Response Models (Data validation)
 class RegisterRequest(BaseModel):
     username: str
@@ -35,11 +53,9 @@ class AuthResponse(BaseModel):
     success: bool
     message: str
     user_data: UserResponse = None
+    token: str = None  # send as "Authorization: Bearer <token>"
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
-
 def is_valid_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -47,53 +63,68 @@ def is_valid_email(email: str) -> bool:
 def calculate_bmi(weight: float, height: int) -> float:
     return round(weight / ((height / 100) ** 2), 2)
 
-# API Endpoints
-@router.post("/register", response_model=AuthResponse)
-async def register_user(request: RegisterRequest):
-    """Register a new user"""
-    
-    # Validation checks
+async def email_taken(email: str) -> bool:
+    """Whether email (any letter case) is registered.
+
+    Storage is read only on a filter hit, or always when other processes
+    can register users behind this one's index.
+    """
+    index = await db.email_index()
+    if not index.might_exist(email) and email_index_is_complete():
+        return False
+    return await db.get_user_version(email) is not None
+
+def registration_error(request: RegisterRequest) -> Optional[str]:
+    """Why the registration data is invalid, or None if it is acceptable"""
     if not is_valid_email(request.email):
-        raise HTTPException(status_code=400, detail="Invalid email format")
-    
+        return "Invalid email format"
     if len(request.password) < 6:
-        raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
-    
+        return "Password must be at least 6 characters"
     if request.age < 1 or request.age > 120:
-        raise HTTPException(status_code=400, detail="Please enter a valid age")
-    
+        return "Please enter a valid age"
     if request.weight < 1 or request.weight > 300:
-        raise HTTPException(status_code=400, detail="Please enter a valid weight")
-    
+        return "Please enter a valid weight"
     if request.height < 50 or request.height > 250:
-        raise HTTPException(status_code=400, detail="Please enter a valid height")
-    
-    # Check if user already exists
-    existing_user = get_user_by_email(request.email)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Calculate BMI
-    bmi = calculate_bmi(request.weight, request.height)
-    
-    # Create user data
-    user_data = {
+        return "Please enter a valid height"
+    return None
+
+def new_user_record(request: RegisterRequest, password_hash: str) -> dict:
+    return {
         "username": request.username,
-        "password_hash": hash_password(request.password),
+        "password_hash": password_hash,
         "email": request.email,
         "age": request.age,
         "weight": request.weight,
         "height": request.height,
         "gender": request.gender,
-        "bmi": bmi,
+        "bmi": calculate_bmi(request.weight, request.height),
         "created_at": datetime.now().isoformat(),
         "last_login": None,
         "health_data": {},
         "recommendation_level": "basic"
     }
+
+# API Endpoints
+@router.post("/register", response_model=AuthResponse)
+async def register_user(request: RegisterRequest):
+    """Register a new user"""
+    request.email = normalize_email(request.email)
+    
+    # Validation checks
+    error = registration_error(request)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
+    # Check if user already exists
+    if await email_taken(request.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Create user data
+    user_data = new_user_record(request, await hasher.hash(request.password))
     
-    # Save user
-    if create_user(request.email, user_data):
+    # Save user (create fails if another request registered the email meanwhile)
+    if await db.create_user(request.email, user_data):
+        (await db.email_index()).add(request.email)
         user_response = UserResponse(
             username=request.username,
             email=request.email,
@@ -101,7 +132,7 @@ async def register_user(request: RegisterRequest):
             weight=request.weight,
             height=request.height,
             gender=request.gender,
-            bmi=bmi,
+            bmi=user_data["bmi"],
             member_since=user_data["created_at"][:10]
         )
         
@@ -111,23 +142,160 @@ async def register_user(request: RegisterRequest):
             user_data=user_response
         )
     else:
-        raise HTTPException(status_code=500, detail="Failed to create user")
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+@router.get("/email-available")
+async def email_available(email: str):
+    """Signup form check: is this email (in any letter case) still free?"""
+    email = normalize_email(email)
+    if not is_valid_email(email):
+        raise HTTPException(status_code=400, detail="Invalid email format")
+    
+    return {"email": email, "available": not await email_taken(email)}
+
+async def iter_lines(stream):
+    """Lines of an uploaded body as they arrive; over-long lines come out as None"""
+    buffer = b""
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False  # end of the over-long line
+                continue
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+        if len(buffer) > BULK_MAX_LINE:
+            if not skipping:
+                yield None
+            buffer, skipping = b"", True
+    if buffer and not skipping:
+        yield buffer.rstrip(b"\r").decode("utf-8", errors="replace")
+
+async def iter_rows(lines, is_csv: bool):
+    """(line number, row dict or error message) for each non-empty NDJSON/CSV line"""
+    header = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if line is None:
+            yield number, f"Line longer than {BULK_MAX_LINE} bytes"
+            continue
+        if not line.strip():
+            continue
+        if not is_csv:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else "Not a JSON object"
+        elif header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+        else:
+            yield number, dict(zip(header, next(csv.reader([line]))))
+
+async def commit_batch(batch):
+    """Hash a batch's passwords in parallel, create its users with one write, and report each row"""
+    hashes = await asyncio.gather(*(hasher.hash(request.password) for _, request in batch))
+    users = {request.email: new_user_record(request, password_hash)
+             for (_, request), password_hash in zip(batch, hashes)}
+    created = await db.create_users(users)
+    index = await db.email_index()
+    for email, ok in created.items():
+        if ok:
+            index.add(email)
+    return [{"line": number, "email": request.email,
+             "status": "created" if created.get(request.email) else "exists"}
+            for number, request in batch]
+
+async def bulk_register_report(lines, is_csv: bool):
+    batch = []
+    async for number, row in iter_rows(lines, is_csv):
+        result = None
+        if isinstance(row, str):
+            result = {"line": number, "status": "invalid", "error": row}
+        else:
+            try:
+                request = RegisterRequest(**row)
+                request.email = normalize_email(request.email)
+                error = registration_error(request)
+            except ValidationError as e:
+                first = e.errors()[0]
+                request, error = None, f"{'.'.join(map(str, first['loc']))}: {first['msg']}"
+            if error:
+                result = {"line": number, "email": row.get("email"), "status": "invalid", "error": error}
+            elif any(request.email == queued.email for _, queued in batch):
+                result = {"line": number, "email": request.email, "status": "duplicate"}
+            elif await email_taken(request.email):
+                result = {"line": number, "email": request.email, "status": "exists"}
+            else:
+                batch.append((number, request))
+        if result:
+            yield json.dumps(result) + "\n"
+        if len(batch) >= BULK_BATCH_SIZE:
+            yield "".join(json.dumps(result) + "\n" for result in await commit_batch(batch))
+            batch = []
+    if batch:
+        yield "".join(json.dumps(result) + "\n" for result in await commit_batch(batch))
+
+def read_report(report):
+    """Chunks of a spooled bulk report; the file is discarded afterwards"""
+    try:
+        report.seek(0)
+        while True:
+            chunk = report.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        report.close()
+
+@router.post("/bulk-register")
+async def bulk_register(request: Request):
+    """Register many users from an NDJSON or CSV (with header row) upload.
+
+    Rows are validated as they stream in and committed BULK_BATCH_SIZE at a
+    time. Their results are spooled (memory, then a temp file) while the
+    upload is read, because the body can no longer be received once the
+    response has started; the response then streams one NDJSON result per
+    row (created, exists, duplicate or invalid).
+    """
+    content_type = request.headers.get("content-type", "")
+    is_csv = "csv" in content_type
+    if not is_csv and "json" not in content_type:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    
+    report = tempfile.SpooledTemporaryFile(max_size=BULK_REPORT_MEMORY)
+    try:
+        async for chunk in bulk_register_report(iter_lines(request.stream()), is_csv):
+            report.write(chunk.encode("utf-8"))
+    except BaseException:
+        report.close()
+        raise
+    return StreamingResponse(read_report(report), media_type="application/x-ndjson")
 
 @router.post("/login", response_model=AuthResponse)
 async def login_user(request: LoginRequest):
     """Login user"""
+    # Storage key of the account, whatever letter case was typed
+    email = await db.resolve_email(request.email)
     
-    user_data = get_user_by_email(request.email)
+    user_data = await db.get_user(email)
     if not user_data:
         raise HTTPException(status_code=401, detail="Email not found")
     
     # Check password
-    if user_data["password_hash"] != hash_password(request.password):
+    if not await hasher.verify(request.password, user_data["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid password")
     
-    # Update last login
-    user_data["last_login"] = datetime.now().isoformat()
-    update_user(request.email, user_data)
+    # last_login is buffered and written in the next activity batch
+    activity.record(email, "login", {"last_login": datetime.now().isoformat()})
+    version = user_data.get(VERSION_KEY, 0)
+    if needs_rehash(user_data["password_hash"]):
+        # Legacy SHA-256 or outdated cost: upgrade now that we know the password
+        await db.patch_user(email, {"password_hash": await hasher.hash(request.password)})
+        version += 1
+    token = issue_token(email, version)
     
     # Prepare response
     user_response = UserResponse(
@@ -144,16 +312,32 @@ async def login_user(request: LoginRequest):
     return AuthResponse(
         success=True,
         message="Login successful",
-        user_data=user_response
+        user_data=user_response,
+        token=token
     )
 
+@router.get("/user/{email}/activity", dependencies=[Depends(require_user)])
+async def get_user_activity(email: str, limit: int = 20):
+    """Recent activity (logins, ...) seen by this server, newest first; needs the user's session token"""
+    email = await db.resolve_email(email)
+    return {
+        "email": email,
+        "activity": activity.recent(email, limit),
+        "unsaved_fields": activity.pending(email)
+    }
+
 @router.get("/user/{email}")
-async def get_user_profile(email: str):
-    """Get user profile by email"""
-    user_data = get_user_by_email(email)
+async def get_user_profile(email: str, response: Response, if_none_match: Optional[str] = Header(None)):
+    """Get user profile by email (supports If-None-Match)"""
+    cached = await not_modified(email, if_none_match)
+    if cached:
+        return cached
+    
+    user_data = await db.get_user(email)
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     
+    response.headers["ETag"] = version_etag(user_data.get(VERSION_KEY, 0))
     return UserResponse(
         username=user_data["username"],
         email=user_data["email"],
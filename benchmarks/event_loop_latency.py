@@ -0,0 +1,81 @@
+"""Event-loop latency while storage is saturated.
+
+Usage (from the repo root):
+    python -m benchmarks.event_loop_latency [users]
+
+A probe coroutine standing in for GET /health wakes every 5 ms and records
+how late it ran, while 32 writers hammer update_user with durability "sync".
+The writers first call shared.database directly (the old blocking handlers),
+then go through shared.async_database.db.
+"""
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from shared import database
+from shared.async_database import AsyncUserDB
+
+PROBE_INTERVAL = 0.005
+WRITERS = 32
+WRITES_PER_WRITER = 5
+
+
+async def probe(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def blocking_writer(email):
+    for i in range(WRITES_PER_WRITER):
+        database.update_user(email, {"last_login": str(i)})
+        await asyncio.sleep(0)
+
+
+async def async_writer(db, email):
+    for i in range(WRITES_PER_WRITER):
+        await db.update_user(email, {"last_login": str(i)})
+
+
+async def measure(writers):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 4)
+    await asyncio.gather(*writers)
+    stop.set()
+    await probe_task
+    lags.sort()
+    return statistics.median(lags), lags[int(len(lags) * 0.99) - 1], len(lags)
+
+
+def main(user_count):
+    workdir = tempfile.mkdtemp(prefix="loop-bench-")
+    database.USERS_FILE = os.path.join(workdir, "users.json")
+    database.USERS_DURABILITY = "sync"
+    emails = [f"user{i}@example.com" for i in range(user_count)]
+    with open(database.USERS_FILE, 'w') as f:
+        json.dump({email: {"email": email, "last_login": None} for email in emails}, f, indent=4)
+
+    db = AsyncUserDB()
+    try:
+        for name, writers in (
+            ("blocking", lambda: [blocking_writer(emails[i]) for i in range(WRITERS)]),
+            ("async", lambda: [async_writer(db, emails[i]) for i in range(WRITERS)]),
+        ):
+            p50, p99, samples = asyncio.run(measure(writers()))
+            print(f"{name:<9} probe lag p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   ({samples} samples)")
+    finally:
+        db.shutdown()
+        database.get_store().close()
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
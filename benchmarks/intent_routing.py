@@ -0,0 +1,72 @@
+"""Intent detection throughput: compiled regex trie vs per-keyword substring scans.
+
+Usage (from the repo root):
+    python -m benchmarks.intent_routing [messages] [words per message]
+
+Builds a synthetic corpus of chat messages from filler words, intent
+keywords and words that merely contain a keyword ("this", "chip",
+"scold", "painting"). Each message is routed by the old approach (lowercase,
+then `any(k in text)` per keyword list) and by the shared IntentRouter
+over the same keyword lists. Reports messages/s for both and how many
+messages the substring scan tagged with an intent the router did not.
+"""
+import random
+import sys
+import time
+
+from chatbot.chatbot_api import INTENT_KEYWORDS
+from shared.intents import IntentRouter
+
+FILLER = ("i", "have", "been", "feeling", "a", "bit", "off", "since", "yesterday", "can", "you", "help",
+          "me", "with", "my", "diet", "and", "sleep", "what", "should", "do", "about", "it", "please",
+          "doctor", "water", "exercise", "walk", "morning", "today", "week", "child", "mother")
+LOOKALIKES = ("this", "chip", "which", "think", "they", "yoga", "scold", "painting", "chestnut", "flute",
+              "shipping", "history", "achieve", "toyota", "whey")
+
+
+def corpus(count, words, seed=7):
+    rng = random.Random(seed)
+    keywords = [phrase for phrases in INTENT_KEYWORDS.values() for phrase in phrases]
+    messages = []
+    for _ in range(count):
+        message = [rng.choice(FILLER) for _ in range(words)]
+        for _ in range(rng.randint(0, 2)):
+            message[rng.randrange(words)] = rng.choice(keywords)
+        for _ in range(rng.randint(0, 2)):
+            message[rng.randrange(words)] = rng.choice(LOOKALIKES)
+        if rng.random() < 0.5:
+            message[0] = message[0].capitalize()
+        messages.append(" ".join(message))
+    return messages
+
+
+def substring_route(text):
+    text = text.lower()
+    return {intent for intent, phrases in INTENT_KEYWORDS.items() if any(phrase in text for phrase in phrases)}
+
+
+def timed(route, messages):
+    start = time.perf_counter()
+    results = [route(message) for message in messages]
+    return results, time.perf_counter() - start
+
+
+def main(count, words):
+    messages = corpus(count, words)
+    router = IntentRouter(INTENT_KEYWORDS)
+    keywords = sum(len(phrases) for phrases in INTENT_KEYWORDS.values())
+    print(f"{count} messages of {words} words, {keywords} keywords in {len(INTENT_KEYWORDS)} intents")
+    old, old_time = timed(substring_route, messages)
+    new, new_time = timed(router.route, messages)
+    for name, elapsed in (("substring", old_time), ("regex trie", new_time)):
+        print(f"{name:<11} {count / elapsed:12,.0f} msgs/s   {elapsed / count * 1e6:7.2f} us/msg")
+    extra = sum(1 for a, b in zip(old, new) if a - b)
+    missed = sum(1 for a, b in zip(old, new) if b - a)
+    print(f"substring scan tagged {extra} messages with an intent that only a word inside another word "
+          f"matched; router found {missed} it missed")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    main(count, words)
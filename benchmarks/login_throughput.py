@@ -0,0 +1,70 @@
+"""Login throughput against the size of the password-hashing process pool.
+
+Usage (from the repo root):
+    python -m benchmarks.login_throughput [logins] [pool sizes...]
+
+Fires `logins` concurrent password checks (the CPU-heavy part of
+/api/auth/login) through shared.passwords.PasswordHasher for each pool
+size, while a probe coroutine records event-loop lag. A last row runs
+scrypt inline on the loop, as an `async def` handler calling hashlib would.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from shared.passwords import PasswordHasher, check_password, scrypt_hash
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def inline_login(password, stored):
+    await asyncio.sleep(0)
+    return check_password(password, stored)
+
+
+async def measure(logins):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 4)
+    start = time.perf_counter()
+    results = await asyncio.gather(*logins)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    assert all(results)
+    lags.sort()
+    return len(results) / elapsed, statistics.median(lags), lags[-1]
+
+
+def report(name, logins_per_second, p50, worst):
+    print(f"{name:<10} {logins_per_second:8.1f} logins/s   loop lag p50 {p50:8.2f} ms   max {worst:8.2f} ms")
+
+
+def main(count, pool_sizes):
+    password = "correct horse battery staple"
+    stored = scrypt_hash(password)
+    print(f"{count} logins, {os.cpu_count()} CPUs")
+    for size in pool_sizes:
+        hasher = PasswordHasher(max_workers=size)
+        try:
+            asyncio.run(hasher.verify(password, stored))  # start the worker processes
+            report(f"pool={size}", *asyncio.run(measure([hasher.verify(password, stored) for _ in range(count)])))
+        finally:
+            hasher.shutdown()
+    report("inline", *asyncio.run(measure([inline_login(password, stored) for _ in range(count)])))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sizes = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8]
+    main(count, sizes)
@@ -0,0 +1,103 @@
+"""Several processes hammering the same users, as multi-worker uvicorn would.
+
+Usage (from the repo root):
+    python -m benchmarks.multiprocess_stress [processes] [rounds]
+
+Each worker process repeats the read -> modify -> conditional update cycle
+that /api/auth/login (last_login) and /api/health-score/calculate
+(health_data) perform, retrying on VersionConflict. Every cycle also bumps a
+counter, so any lost update shows up as a missing count at the end.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+from shared import database
+
+USERS = 4
+BACKENDS = ("json", "journal", "sharded", "sqlite")
+
+
+def configure(workdir: str, backend: str):
+    database.USERS_FILE = os.path.join(workdir, "users.json")
+    database.USERS_DB_FILE = os.path.join(workdir, "users.db")
+    database.USERS_STORAGE = backend
+    database.USERS_SHARDS = 4
+    database.USERS_MULTIPROCESS = True
+    database.USERS_COMPACT_EVERY = 50  # compact often to exercise log rotation across processes
+
+
+def conditional_update(email: str, modify) -> int:
+    """Retry until the update lands on the version it was computed from; returns retries"""
+    retries = 0
+    while True:
+        user = database.get_user_by_email(email)
+        try:
+            database.update_user(email, modify(user), expected_version=user.get("_version", 0))
+            return retries
+        except database.VersionConflict:
+            retries += 1
+
+
+def login(user):
+    return {"last_login": "now", "logins": user.get("logins", 0) + 1}
+
+
+def calculate(user):
+    health = dict(user.get("health_data", {}))
+    health["submissions"] = health.get("submissions", 0) + 1
+    return {"health_data": health, "recommendation_level": "advanced"}
+
+
+def worker(workdir: str, backend: str, worker_id: int, rounds: int, results):
+    configure(workdir, backend)
+    retries = 0
+    for i in range(rounds):
+        email = f"user{(worker_id + i) % USERS}@example.com"
+        retries += conditional_update(email, login)
+        retries += conditional_update(email, calculate)
+    database.get_store().close()
+    results.put(retries)
+
+
+def run(backend: str, processes: int, rounds: int):
+    workdir = tempfile.mkdtemp(prefix="stress-")
+    try:
+        with open(os.path.join(workdir, "users.json"), 'w') as f:
+            json.dump({f"user{i}@example.com": {"email": f"user{i}@example.com"} for i in range(USERS)}, f)
+        configure(workdir, backend)
+        database.get_store()  # one-time migration/split before the workers start
+        database.get_store().close()
+        database._store = None
+
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=worker, args=(workdir, backend, n, rounds, results))
+                 for n in range(processes)]
+        for proc in procs:
+            proc.start()
+        retries = sum(results.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+
+        users = database.get_store().all()
+        database.get_store().close()
+        database._store = None
+        logins = sum(user.get("logins", 0) for user in users.values())
+        submissions = sum(user.get("health_data", {}).get("submissions", 0) for user in users.values())
+        expected = processes * rounds
+        status = "OK" if logins == expected and submissions == expected else "LOST UPDATES"
+        print(f"{backend:<8} logins {logins}/{expected}  submissions {submissions}/{expected}  "
+              f"retries {retries}  {status}")
+        return status == "OK"
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ok = all([run(backend, processes, rounds) for backend in BACKENDS])
+    sys.exit(0 if ok else 1)
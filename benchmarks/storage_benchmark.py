@@ -0,0 +1,86 @@
+"""Compare the JSON, journal and SQLite user stores.
+
+Usage (from the repo root):
+    python -m benchmarks.storage_benchmark [sizes...]
+
+Defaults to 10k, 100k and 1M users. Every store runs with durability "sync"
+so each update is on disk before it returns.
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from shared.journal import JournaledUserStore
+from shared.sqlite_store import SqliteUserStore, migrate_json_to_sqlite
+from shared.user_store import UserStore
+
+LOOKUPS = 2000
+UPDATES = 20
+
+
+def make_user(i: int) -> dict:
+    return {
+        "username": f"user{i}",
+        "password_hash": "0" * 64,
+        "email": f"user{i}@example.com",
+        "age": 20 + i % 60,
+        "weight": 70.0,
+        "height": 170,
+        "gender": "Other",
+        "bmi": 24.22,
+        "created_at": "2024-01-01T00:00:00",
+        "last_login": None,
+        "health_data": {},
+        "recommendation_level": "basic"
+    }
+
+
+def write_users_file(path: str, count: int):
+    with open(path, 'w') as f:
+        json.dump({f"user{i}@example.com": make_user(i) for i in range(count)}, f, indent=4)
+
+
+def run_store(name: str, open_store, count: int):
+    emails = [f"user{random.randrange(count)}@example.com" for _ in range(LOOKUPS)]
+
+    start = time.perf_counter()
+    store = open_store()
+    open_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for email in emails:
+        store.get(email)
+    get_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+
+    start = time.perf_counter()
+    for email in emails[:UPDATES]:
+        store.update(email, {"last_login": "2024-06-01T08:00:00"})
+    update_ms = (time.perf_counter() - start) / UPDATES * 1000
+
+    store.close()
+    print(f"{count:>9} {name:<8} open {open_ms:>10.1f} ms   get {get_us:>8.1f} us   update {update_ms:>9.2f} ms")
+
+
+def main(sizes):
+    for count in sizes:
+        workdir = tempfile.mkdtemp(prefix="users-bench-")
+        try:
+            json_path = os.path.join(workdir, "users.json")
+            db_path = os.path.join(workdir, "users.db")
+            write_users_file(json_path, count)
+            migrate_json_to_sqlite(json_path, db_path)
+
+            run_store("json", lambda: UserStore(json_path, durability="sync"), count)
+            run_store("journal", lambda: JournaledUserStore(json_path, durability="sync",
+                                                            compact_every=UPDATES + 1), count)
+            run_store("sqlite", lambda: SqliteUserStore(db_path, durability="sync"), count)
+        finally:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
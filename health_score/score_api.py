@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
-from shared.database import get_user_by_email, update_user
+from typing import Dict, Any, Optional
+from datetime import datetime
+import json
+import math
+from shared.async_database import db
+from shared.conditional import not_modified, version_etag
+from shared.history_store import History
+from shared.user_store import VERSION_KEY
 
 router = APIRouter()
 
@@ -24,6 +31,9 @@ class HealthScoreResponse(BaseModel):
     detailed_scores: Dict[str, float]
     message: str
 
+# Rows serialized per chunk of a streamed history response
+HISTORY_CHUNK_ROWS = 256
+
 # Health Score Calculator (copied from your score.py)
 class HealthScoreCalculator:
     def __init__(self):
@@ -191,8 +201,8 @@ async def calculate_health_score(request: HealthScoreRequest):
     if request.activity_level < 1 or request.activity_level > 5:
         raise HTTPException(status_code=400, detail="Activity level must be between 1-5")
     
-    # Get user data
-    user_data = get_user_by_email(request.email)
+    # Get user data (the score needs only weight and height, no full record)
+    user_data = await db.get_user_numbers(request.email)
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -221,11 +231,13 @@ async def calculate_health_score(request: HealthScoreRequest):
         'overall_score': result['overall_score']
     }
     
-    # Update user data
-    user_data['health_data'] = user_health_data
-    user_data['recommendation_level'] = 'advanced'
-    
-    if update_user(request.email, user_data):
+    # Update only the fields this endpoint owns
+    if await db.patch_user(request.email, {
+        'health_data': user_health_data,
+        'recommendation_level': 'advanced'
+    }):
+        # Keep every submission for trends; the profile only holds the latest
+        await db.append_health_history(request.email, {**health_data, **user_health_data})
         return HealthScoreResponse(
             success=True,
             overall_score=result['overall_score'],
@@ -237,13 +249,55 @@ async def calculate_health_score(request: HealthScoreRequest):
         raise HTTPException(status_code=500, detail="Failed to save health data")
 
 @router.get("/user/{email}")
-async def get_user_health_data(email: str):
-    """Get user's health data"""
-    user_data = get_user_by_email(email)
+async def get_user_health_data(email: str, response: Response, if_none_match: Optional[str] = Header(None)):
+    """Get user's health data (supports If-None-Match)"""
+    cached = await not_modified(email, if_none_match)
+    if cached:
+        return cached
+    
+    user_data = await db.get_user(email)
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     
+    response.headers["ETag"] = version_etag(user_data.get(VERSION_KEY, 0))
     return {
         "health_data": user_data.get('health_data', {}),
         "recommendation_level": user_data.get('recommendation_level', 'basic')
     }
+
+def parse_time(value: Optional[str], name: str) -> Optional[float]:
+    """ISO date/datetime ("2024-05-01", "2024-05-01T08:30:00") or epoch seconds -> epoch seconds"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}' time: {value}")
+
+def stream_history(history: History):
+    """NDJSON lines, one per submission, serialized a chunk at a time"""
+    lines = []
+    for row in history.rows():
+        row = {key: None if math.isnan(value) else value for key, value in row.items()}
+        row['timestamp'] = datetime.fromtimestamp(row['timestamp']).isoformat()
+        lines.append(json.dumps(row) + "\n")
+        if len(lines) >= HISTORY_CHUNK_ROWS:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+@router.get("/user/{email}/history")
+async def get_user_health_history(email: str, from_: Optional[str] = Query(None, alias="from"),
+                                  to: Optional[str] = None):
+    """Stream the user's past submissions between `from` and `to` (both optional) as NDJSON"""
+    start, end = parse_time(from_, "from"), parse_time(to, "to")
+    if not await db.get_user(email):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    history = await db.get_health_history(email, start, end)
+    return StreamingResponse(stream_history(history), media_type="application/x-ndjson")
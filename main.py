@@ -8,6 +8,14 @@ from chatbot.chatbot_api import router as chatbot_router
 from health_score.score_api import router as health_score_router
 from recommendations.rec_api import router as recommendations_router
 from symptom_checker.symptom_api import router as symptom_router
+from shared.activity import activity
+from shared.async_database import db
+from shared.database import flush_users, get_storage_metrics
+from shared.llm_client import llm
+from shared.semantic_cache import semantic_cache
+from shared.fast_path import template_responder, chat_tiers
+from shared.passwords import hasher
+from shared.rate_limit import RateLimitMiddleware
 
 # Create FastAPI app
 app = FastAPI(
@@ -16,6 +24,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Per-IP / per-email token buckets on login, register and the LLM endpoints
+# (added before CORS so 429 responses still carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware (important for Flutter app to communicate)
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +44,53 @@ app.include_router(health_score_router, prefix="/api/health-score", tags=["Healt
 app.include_router(recommendations_router, prefix="/api/recommendations", tags=["Recommendations"])
 app.include_router(symptom_router, prefix="/api/symptom-checker", tags=["Symptom Checker"])
 
+# Lifecycle hooks
+@app.on_event("startup")
+async def warm_email_index():
+    # Build the registered-email filter before the first signup check needs it
+    await db.email_index()
+
+@app.on_event("startup")
+async def start_password_pool():
+    # Start the KDF workers now, through forkserver/spawn rather than fork
+    hasher.start()
+
+@app.on_event("startup")
+async def start_llm_client():
+    await llm.start()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm.close()
+
+@app.on_event("shutdown")
+async def shutdown_storage():
+    # Write buffered activity, let queued storage calls finish, then flush anything still write-behind
+    activity.close()
+    db.shutdown()
+    flush_users()
+    hasher.shutdown()
+
+# Storage metrics (group commit batch sizes)
+@app.get("/metrics/storage")
+async def storage_metrics():
+    return get_storage_metrics()
+
+# LLM response cache metrics (hits, misses, evictions, bytes)
+@app.get("/metrics/llm-cache")
+async def llm_cache_metrics():
+    return llm.cache.snapshot() if llm.cache is not None else {"enabled": False}
+
+# Chatbot similarity cache metrics (hits per threshold, entries per scope)
+@app.get("/metrics/semantic-cache")
+async def semantic_cache_metrics():
+    return semantic_cache.snapshot()
+
+# Chat answers per serving tier, template A/B split, and Gemini calls made vs coalesced
+@app.get("/metrics/chat-tiers")
+async def chat_tier_metrics():
+    return {"tiers": chat_tiers.snapshot(), "templates": template_responder.snapshot(), "llm": llm.stats}
+
 # Root endpoint
 # @app.get("/")
 # async def root():
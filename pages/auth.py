@@ -1,11 +1,10 @@
 import streamlit as st
 import sys
 import os
-import json
-from pathlib import Path
 
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from shared.ui_store import get_user, create_user
 
 st.set_page_config(
     page_title="Login - Health Assistant",
@@ -13,51 +12,14 @@ st.set_page_config(
     layout="centered"
 )
 
-# CORRECT Path to users.json - in main API folder
-USERS_FILE = Path(__file__).parent.parent / "users.json"
-
-def load_users():
-    """Load users from JSON file"""
-    try:
-        if USERS_FILE.exists():
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content:  # If file is empty
-                    return {}
-                return json.loads(content)
-        # If file doesn't exist, create it
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump({}, f, indent=2)
-        return {}
-    except json.JSONDecodeError:
-        st.error("❌ Users file is corrupted. Creating new one...")
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump({}, f, indent=2)
-        return {}
-    except Exception as e:
-        st.error(f"❌ Error loading users: {e}")
-        return {}
-
-def save_users(users):
-    """Save users to JSON file"""
-    try:
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=2)
-        return True
-    except Exception as e:
-        st.error(f"❌ Error saving users: {e}")
-        return False
-
 def register_user(username, email, password, age, weight, height, gender):
     """Register a new user"""
-    users = load_users()
-    
     # Check if user already exists
-    if email in users:
+    if get_user(email) is not None:
         return False, "User already exists with this email!"
     
     # Add new user
-    users[email] = {
+    user = {
         "username": username,
         "password": password,
         "age": age,
@@ -66,21 +28,21 @@ def register_user(username, email, password, age, weight, height, gender):
         "gender": gender
     }
     
-    if save_users(users):
+    if create_user(email, user):
         return True, "Registration successful!"
     else:
         return False, "Registration failed!"
 
 def login_user(email, password):
     """Login existing user"""
-    users = load_users()
+    user = get_user(email)
     
     # Check if user exists
-    if email not in users:
+    if user is None:
         return False, "User not found! Please register first."
     
     # Check password
-    if users[email]["password"] != password:
+    if user["password"] != password:
         return False, "Incorrect password!"
     
     return True, "Login successful!"
@@ -123,8 +85,7 @@ with tab1:
                     st.success(f"✅ {message}")
                     st.session_state.logged_in = True
                     st.session_state.user_email = login_email
-                    users_data = load_users()
-                    st.session_state.username = users_data[login_email]["username"]
+                    st.session_state.username = get_user(login_email)["username"]
                     
                     st.balloons()
                     st.rerun()
@@ -1,36 +1,10 @@
 import streamlit as st
 import sys
 import os
-import json
-from pathlib import Path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from shared.ui_store import patch_user
 
-def load_users():
-    """Load users from JSON file"""
-    try:
-        USERS_FILE = Path(__file__).parent.parent / "users.json"
-        if USERS_FILE.exists():
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content:
-                    return {}
-                return json.loads(content)
-        return {}
-    except Exception as e:
-        st.error(f"Error loading users: {e}")
-        return {}
-
-def save_users(users):
-    """Save users to JSON file"""
-    try:
-        USERS_FILE = Path(__file__).parent.parent / "users.json"
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=2)
-        return True
-    except Exception as e:
-        st.error(f"Error saving users: {e}")
-        return False
 # Add backend to path
 st.set_page_config(
     page_title="Health Score - Health Assistant",
@@ -155,24 +129,22 @@ if calculate_btn:
                                 # Save health data to user profile
                 try:
                     user_email = st.session_state.user_email
-                    users_data = load_users()
-                    if user_email in users_data:
-                        # Calculate BMI for saving
-                        height_m = height / 100
-                        user_bmi = round(weight / (height_m * height_m), 1)
-                        
-                        users_data[user_email]["health_data"] = {
-                            'sleep_score': sleep_score,
-                            'activity_score': activity_score,
-                            'stress_score': stress_score,
-                            'hydration_score': hydration_score,
-                            'overall_score': overall_score,
-                            'bmi': user_bmi
-                        }
-                        if save_users(users_data):
-                            st.success("💾 Health data saved to your profile!")
-                        else:
-                            st.error("❌ Failed to save health data")
+                    # Calculate BMI for saving
+                    height_m = height / 100
+                    user_bmi = round(weight / (height_m * height_m), 1)
+                    
+                    health_data = {
+                        'sleep_score': sleep_score,
+                        'activity_score': activity_score,
+                        'stress_score': stress_score,
+                        'hydration_score': hydration_score,
+                        'overall_score': overall_score,
+                        'bmi': user_bmi
+                    }
+                    if patch_user(user_email, {"health_data": health_data}):
+                        st.success("💾 Health data saved to your profile!")
+                    else:
+                        st.error("❌ Failed to save health data")
                 except Exception as e:
                     st.error(f"Could not save health data: {e}")
 
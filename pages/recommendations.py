@@ -1,11 +1,10 @@
 import streamlit as st
 import sys
 import os
-import json
-from pathlib import Path
 
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from shared.ui_store import get_user
 st.set_page_config(
     page_title="Recommendations - Health Assistant", 
     page_icon="🎯"
@@ -20,23 +19,6 @@ if not st.session_state.get('logged_in'):
 
 st.success(f"Welcome, {st.session_state.user_email}! Get your personalized health plan.")
 
-# Load user data
-USERS_FILE = Path(__file__).parent.parent / "users.json"
-
-def load_user_data():
-    """Load user data from JSON file"""
-    try:
-        if USERS_FILE.exists():
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if not content:
-                    return {}
-                return json.loads(content)
-        return {}
-    except Exception as e:
-        st.error(f"Error loading user data: {e}")
-        return {}
-
 def calculate_bmi(weight, height):
     """Calculate BMI from weight and height"""
     height_m = height / 100  # Convert cm to meters
@@ -54,15 +36,13 @@ def get_bmi_category(bmi):
         return "Obese", "weight_loss"
 
 # Get user data
-users_data = load_user_data()
 user_email = st.session_state.user_email
+user_data = get_user(user_email)
 
-if user_email not in users_data:
+if user_data is None:
     st.error("User data not found! Please register again.")
     st.stop()
 
-user_data = users_data[user_email]
-
 # Check if user has health assessment data
 has_health_data = "health_data" in user_data
 
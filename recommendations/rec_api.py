@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Response, Header
 from pydantic import BaseModel
-from typing import Dict, Any, List
-from shared.database import get_user_by_email
+from typing import Dict, Any, List, Optional
+from shared.async_database import db
+from shared.conditional import not_modified, version_etag
+from shared.sessions import require_user
+from shared.user_store import VERSION_KEY
 
 router = APIRouter()
 
@@ -314,14 +317,18 @@ class RecommendationEngine:
 # API Endpoints
 engine = RecommendationEngine()
 
-@router.get("/user/{email}", response_model=RecommendationResponse)
-async def get_recommendations(email: str):
-    """Get personalized recommendations for a user"""
+@router.get("/user/{email}", response_model=RecommendationResponse, dependencies=[Depends(require_user)])
+async def get_recommendations(email: str, response: Response, if_none_match: Optional[str] = Header(None)):
+    """Get personalized recommendations for a user (needs that user's session token, supports If-None-Match)"""
+    cached = await not_modified(email, if_none_match)
+    if cached:
+        return cached
     
-    user_data = get_user_by_email(email)
+    user_data = await db.get_user(email)
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
     
+    response.headers["ETag"] = version_etag(user_data.get(VERSION_KEY, 0))
     recommendations = engine.get_recommendations(user_data)
     
     return RecommendationResponse(
@@ -339,7 +346,7 @@ async def get_recommendations(email: str):
 @router.get("/test/{email}")
 async def test_recommendations(email: str):
     """Test endpoint to check recommendation level"""
-    user_data = get_user_by_email(email)
+    user_data = await db.get_user(email)
     if not user_data:
         return {"error": "User not found"}
     
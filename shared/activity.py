@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from shared import database
+
+# Seconds between batched writes of buffered profile fields (e.g. last_login)
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5.0"))
+# Users with buffered fields that trigger an early flush
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "10000"))
+# Recent events kept per user, and users kept (least recently active dropped first)
+ACTIVITY_RECENT_PER_USER = int(os.getenv("ACTIVITY_RECENT_PER_USER", "20"))
+ACTIVITY_RECENT_USERS = int(os.getenv("ACTIVITY_RECENT_USERS", "10000"))
+
+
+class ActivityRecorder:
+    """Buffers low-value per-user bookkeeping off the request path.
+
+    `record()` only touches memory: the event goes into the user's recent
+    activity list, and the profile fields it updates (such as last_login)
+    are merged into a pending patch. A background thread writes all pending
+    patches with one `patch_users` call every `flush_interval` seconds, or
+    sooner once `max_pending` users are waiting. A crash can lose at most
+    the last interval's worth of these fields; a failed write keeps them
+    buffered for the next batch.
+
+    Each batched patch bumps the record's `_version`, so a login also
+    changes the ETags of the profile, health-data and recommendation reads
+    even though none of them return last_login: clients re-download once
+    per login. This is accepted to keep a single version per record.
+    """
+
+    def __init__(self, flush_interval: float = ACTIVITY_FLUSH_INTERVAL, max_pending: int = ACTIVITY_MAX_PENDING,
+                 recent_per_user: int = ACTIVITY_RECENT_PER_USER, recent_users: int = ACTIVITY_RECENT_USERS):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.recent_per_user = recent_per_user
+        self.recent_users = recent_users
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._recent: "OrderedDict[str, deque]" = OrderedDict()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def record(self, email: str, event: str, fields: Optional[Dict[str, Any]] = None):
+        """Note an event for email; `fields` are patched onto the profile in the next batch"""
+        entry = {"event": event, "at": datetime.now().isoformat()}
+        with self._lock:
+            if self._flusher is None and not self._stop.is_set():
+                self._flusher = threading.Thread(target=self._flush_loop, name="activity-flusher", daemon=True)
+                self._flusher.start()
+            events = self._recent.pop(email, None) or deque(maxlen=self.recent_per_user)
+            events.appendleft(entry)
+            self._recent[email] = events
+            if len(self._recent) > self.recent_users:
+                self._recent.popitem(last=False)
+            if fields:
+                self._pending.setdefault(email, {}).update(fields)
+                if len(self._pending) >= self.max_pending:
+                    self._wakeup.set()
+
+    def recent(self, email: str, limit: int = ACTIVITY_RECENT_PER_USER) -> List[Dict[str, Any]]:
+        """Newest-first events recorded for email by this process"""
+        with self._lock:
+            return list(self._recent.get(email, ()))[:limit]
+
+    def pending(self, email: str) -> Dict[str, Any]:
+        """Profile fields recorded for email but not yet written"""
+        with self._lock:
+            return dict(self._pending.get(email, {}))
+
+    def flush(self) -> bool:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return True
+        try:
+            saved = database.patch_users(batch)
+            # False means the user is missing or the write failed; only the latter is retried
+            failed = [email for email, ok in saved.items()
+                      if not ok and database.get_user_version(email) is not None]
+        except Exception as e:
+            print(f"Error saving user activity: {e}")
+            failed = list(batch)
+        if not failed:
+            return True
+        print(f"Error saving user activity: {len(failed)} users kept for the next batch")
+        with self._lock:
+            for email in failed:
+                # Keep anything recorded meanwhile, it is newer
+                self._pending[email] = {**batch[email], **self._pending.get(email, {})}
+        return False
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write whatever is still buffered"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+
+activity = ActivityRecorder()
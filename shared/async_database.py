@@ -0,0 +1,124 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from shared import database
+from shared.email_index import EmailIndex
+from shared.history_store import History
+
+# Threads doing blocking storage I/O, and how many calls may wait for one of them
+STORAGE_WORKERS = int(os.getenv("STORAGE_WORKERS", "4"))
+STORAGE_MAX_PENDING = int(os.getenv("STORAGE_MAX_PENDING", "64"))
+# With USERS_DURABILITY=group, writes get their own threads: each one blocks a thread
+# until its batch commits, so this is also the most writes a batch can ever hold
+STORAGE_GROUP_WRITERS = int(os.getenv("STORAGE_GROUP_WRITERS", str(database.USERS_GROUP_COMMIT_MAX_BATCH)))
+
+
+class AsyncUserDB:
+    """Awaitable storage API for the FastAPI routers.
+
+    Calls into shared.database run on a small dedicated thread pool, so a
+    slow disk write only occupies a storage thread instead of stalling the
+    event loop. Emails are resolved to their storage key (see
+    `resolve_email`), so every letter case of an address reaches the same
+    record. At most `max_pending` calls are queued for the pool; further
+    callers wait on the loop (without blocking it) for a free slot.
+
+    A group-commit writer holds its thread until the batch is flushed, so
+    with `write_workers` set, writes run on a separate pool of that many
+    threads: batches can fill up to that size (the effective group-commit
+    cap is min(write_workers, USERS_GROUP_COMMIT_MAX_BATCH)) and reads
+    never queue behind writers waiting out the commit window.
+    """
+
+    def __init__(self, max_workers: int = STORAGE_WORKERS, max_pending: int = STORAGE_MAX_PENDING,
+                 write_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.write_workers = write_workers
+        self._executor = None
+        self._slots = None
+        self._write_executor = None
+        self._write_slots = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="storage")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _run_write(self, func, *args):
+        if not self.write_workers:
+            return await self._run(func, *args)
+        if self._write_executor is None:
+            self._write_executor = ThreadPoolExecutor(self.write_workers, thread_name_prefix="storage-write")
+        if self._write_slots is None:
+            self._write_slots = asyncio.Semaphore(max(self.max_pending, self.write_workers))
+        async with self._write_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._write_executor, func, *args)
+
+    async def resolve_email(self, email: str) -> str:
+        """Storage key for an email as typed ("Ann@Example.com" -> "ann@example.com")"""
+        index = database.cached_email_index()
+        if index is not None and database.email_index_is_complete():
+            return index.resolve(email)
+        return await self._run(database.resolve_email, email)
+
+    async def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        return await self._run(database.get_user_by_email, await self.resolve_email(email))
+
+    async def get_user_numbers(self, email: str) -> Optional[Dict[str, Any]]:
+        return await self._run(database.get_user_numbers, await self.resolve_email(email))
+
+    async def email_index(self) -> EmailIndex:
+        """The normalized email index; only the first call (or a rebuild) reads storage"""
+        return database.cached_email_index() or await self._run(database.get_email_index)
+
+    async def get_user_version(self, email: str) -> Optional[int]:
+        return await self._run(database.get_user_version, await self.resolve_email(email))
+
+    async def update_user(self, email: str, user_data: Dict[str, Any],
+                          expected_version: Optional[int] = None) -> bool:
+        return await self._run_write(database.update_user, await self.resolve_email(email), user_data, expected_version)
+
+    async def patch_user(self, email: str, changes: Dict[str, Any],
+                         expected_version: Optional[int] = None) -> bool:
+        return await self._run_write(database.patch_user, await self.resolve_email(email), changes, expected_version)
+
+    async def create_user(self, email: str, user_data: Dict[str, Any]) -> bool:
+        return await self._run_write(database.create_user, email, user_data)
+
+    async def create_users(self, users_data: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        return await self._run_write(database.create_users, users_data)
+
+    async def load_users(self) -> Dict[str, Any]:
+        return await self._run(database.load_users)
+
+    async def save_users(self, users_data: Dict[str, Any]) -> bool:
+        return await self._run_write(database.save_users, users_data)
+
+    async def append_health_history(self, email: str, values: Dict[str, float]) -> bool:
+        return await self._run(database.append_health_history, await self.resolve_email(email), values)
+
+    async def get_health_history(self, email: str, start: Optional[float] = None,
+                                 end: Optional[float] = None) -> History:
+        return await self._run(database.get_health_history, await self.resolve_email(email), start, end)
+
+    async def flush(self) -> bool:
+        return await self._run_write(database.flush_users)
+
+    def shutdown(self):
+        """Wait for in-flight storage calls to finish and release the pool"""
+        for executor in (self._executor, self._write_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._executor = self._write_executor = None
+        self._slots = self._write_slots = None
+
+
+db = AsyncUserDB(write_workers=STORAGE_GROUP_WRITERS if database.USERS_DURABILITY == "group" else None)
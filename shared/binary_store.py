@@ -0,0 +1,449 @@
+import copy
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Dict, Any, Optional, Tuple, List
+
+from shared.group_commit import GroupCommitter
+from shared.user_store import DURABILITY_MODES, VERSION_KEY, VersionConflict, apply_patch
+
+# Numeric fields kept in the fixed-width record instead of the JSON heap
+NUMERIC_FIELDS = (
+    ("age",),
+    ("weight",),
+    ("height",),
+    ("bmi",),
+    ("health_data", "bmi_score"),
+    ("health_data", "sleep_score"),
+    ("health_data", "activity_score"),
+    ("health_data", "hydration_score"),
+    ("health_data", "stress_score"),
+    ("health_data", "overall_score"),
+)
+
+# <base>.rec: header, then one fixed-width record per user
+HEADER = struct.Struct("<4sIQQ")  # magic, heap generation, record count, capacity
+REC_MAGIC = b"HUSR"
+# flags, present mask, int mask, version, email offset/length, blob offset/length, numeric fields
+RECORD = struct.Struct(f"<BxHHIQIQI{len(NUMERIC_FIELDS)}d")
+LIVE = 1
+
+# <base>.heap.<generation>: append-only emails and JSON blobs of the remaining fields
+HEAP_MAGIC = b"HUSRHEAP"
+
+INITIAL_CAPACITY = 1024
+# Rewrite the heap once garbage from replaced blobs exceeds the live data (and this floor)
+COMPACT_MIN_GARBAGE = 4 * 1024 * 1024
+
+
+def split_record(record: Dict[str, Any]) -> Tuple[List[float], int, int, Dict[str, Any]]:
+    """Pull the numeric fields out of a user record.
+
+    Returns (numbers, present mask, int mask, remaining fields); int mask
+    remembers which values were ints so they round-trip unchanged.
+    """
+    rest = dict(record)
+    rest.pop(VERSION_KEY, None)
+    if isinstance(rest.get("health_data"), dict):
+        rest["health_data"] = dict(rest["health_data"])
+    numbers = [math.nan] * len(NUMERIC_FIELDS)
+    present = ints = 0
+    for i, path in enumerate(NUMERIC_FIELDS):
+        parent = rest if len(path) == 1 else rest.get(path[0])
+        if not isinstance(parent, dict):
+            continue
+        value = parent.get(path[-1])
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        del parent[path[-1]]
+        numbers[i] = float(value)
+        present |= 1 << i
+        if isinstance(value, int):
+            ints |= 1 << i
+    return numbers, present, ints, rest
+
+
+def join_record(rest: Dict[str, Any], numbers, present: int, ints: int, version: int) -> Dict[str, Any]:
+    for i, path in enumerate(NUMERIC_FIELDS):
+        if present & (1 << i):
+            parent = rest if len(path) == 1 else rest.setdefault(path[0], {})
+            parent[path[-1]] = int(numbers[i]) if ints & (1 << i) else numbers[i]
+    rest[VERSION_KEY] = version
+    return rest
+
+
+def numbers_by_path(numbers, present: int, ints: int) -> Dict[str, Any]:
+    """{"weight": 70.5, "health_data.overall_score": 82, ...} for the fields that are present"""
+    return {".".join(path): int(numbers[i]) if ints & (1 << i) else numbers[i]
+            for i, path in enumerate(NUMERIC_FIELDS) if present & (1 << i)}
+
+
+def numeric_fields(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The NUMERIC_FIELDS of a user record as numbers_by_path() returns them"""
+    numbers, present, ints, _ = split_record(record)
+    return numbers_by_path(numbers, present, ints)
+
+
+def heap_path(base_path: str, generation: int) -> str:
+    return f"{base_path}.heap.{generation}"
+
+
+def write_binary_files(base_path: str, users: Dict[str, Any], generation: int):
+    """Write a complete store (new heap generation + record file) and swap it in atomically"""
+    rec_path = f"{base_path}.rec"
+    capacity = max(INITIAL_CAPACITY, len(users) * 2)
+    with open(heap_path(base_path, generation), 'wb') as heap, open(f"{rec_path}.tmp", 'wb') as rec:
+        heap.write(HEAP_MAGIC)
+        offset = len(HEAP_MAGIC)
+        rec.write(HEADER.pack(REC_MAGIC, generation, len(users), capacity))
+        for email, record in users.items():
+            numbers, present, ints, rest = split_record(record)
+            email_bytes = email.encode('utf-8')
+            blob = json.dumps(rest, separators=(',', ':')).encode('utf-8')
+            heap.write(email_bytes)
+            heap.write(blob)
+            rec.write(RECORD.pack(LIVE, present, ints, record.get(VERSION_KEY, 0),
+                                  offset, len(email_bytes), offset + len(email_bytes), len(blob), *numbers))
+            offset += len(email_bytes) + len(blob)
+        rec.truncate(HEADER.size + capacity * RECORD.size)
+        for f in (heap, rec):
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(f"{rec_path}.tmp", rec_path)
+
+    # Heaps of other generations are no longer referenced
+    directory, prefix = os.path.split(heap_path(base_path, ""))
+    for name in os.listdir(directory or "."):
+        if name.startswith(prefix) and name != os.path.basename(heap_path(base_path, generation)):
+            os.remove(os.path.join(directory, name))
+
+
+class BinaryUserStore:
+    """Users in a memory-mapped binary format for very large user bases.
+
+    `<base>.rec` holds one fixed-width record per user: age, weight, height,
+    bmi, the five sub-scores and overall_score as packed doubles, plus the
+    offsets of the email and of a compact JSON blob with every other field in
+    `<base>.heap.<generation>`. Both files are accessed through mmap and an
+    email -> record-slot dict is built on open.
+
+    Numeric reads (`get_numbers`) unpack straight from the mapping without
+    touching the heap. Updates rewrite numbers in place and append a new blob
+    only when non-numeric fields change; replaced blobs are reclaimed by
+    rewriting the heap once they outweigh live data. Single process only.
+
+    Changed records (and the header's record count) wait in memory until
+    the next flush, which fsyncs the heap before copying them into the
+    mapping: the kernel may write mapped pages back at any moment, and a
+    record must never reach disk ahead of the heap bytes it points to.
+    """
+
+    def __init__(self, base_path: str, durability: str = "write_behind", flush_interval: float = 1.0,
+                 group_window: float = 0.005, group_max_batch: int = 64):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.base_path = base_path
+        self.rec_path = f"{base_path}.rec"
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._pending: Dict[int, bytes] = {}  # packed records not yet copied into the mapping
+        if not os.path.exists(self.rec_path):
+            write_binary_files(base_path, {}, 0)
+        self._open()
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+        if durability == "write_behind":
+            self._flusher = threading.Thread(target=self._flush_loop, name="users-flusher", daemon=True)
+            self._flusher.start()
+        self._committer = None
+        if durability == "group":
+            self._committer = GroupCommitter(self.flush, window=group_window, max_batch=group_max_batch)
+
+    # Files
+    def _open(self):
+        self._rec_file = open(self.rec_path, 'r+b')
+        self._rec_map = mmap.mmap(self._rec_file.fileno(), 0)
+        magic, self._generation, self._count, self._capacity = HEADER.unpack_from(self._rec_map, 0)
+        if magic != REC_MAGIC:
+            raise ValueError(f"{self.rec_path} is not a binary user store")
+        self._heap_file = open(heap_path(self.base_path, self._generation), 'a+b')
+        self._heap_size = os.fstat(self._heap_file.fileno()).st_size
+        self._heap_map = mmap.mmap(self._heap_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._pending = {}
+        self._synced_count = self._count
+
+        self._index = {}
+        live_bytes = len(HEAP_MAGIC)
+        for slot in range(self._count):
+            fields = RECORD.unpack_from(self._rec_map, self._slot_offset(slot))
+            if fields[0] & LIVE:
+                email_off, email_len, blob_off, blob_len = fields[4:8]
+                if max(email_off + email_len, blob_off + blob_len) > self._heap_size:
+                    self._close_files()
+                    raise ValueError(f"{self.rec_path}: record {slot} points past the end of "
+                                     f"{heap_path(self.base_path, self._generation)}")
+                self._index[self._heap_slice(email_off, email_len).decode('utf-8')] = slot
+                live_bytes += email_len + blob_len
+        self._garbage = self._heap_size - live_bytes
+
+    def _close_files(self):
+        self._rec_map.close()
+        self._rec_file.close()
+        self._heap_map.close()
+        self._heap_file.close()
+
+    def _slot_offset(self, slot: int) -> int:
+        return HEADER.size + slot * RECORD.size
+
+    def _heap_slice(self, offset: int, length: int) -> bytes:
+        if offset + length > len(self._heap_map):
+            # Appended since the heap was mapped
+            self._heap_map.close()
+            self._heap_map = mmap.mmap(self._heap_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._heap_map[offset:offset + length]
+
+    def _append_heap(self, data: bytes) -> int:
+        offset = self._heap_size
+        self._heap_file.write(data)
+        self._heap_file.flush()
+        self._heap_size += len(data)
+        return offset
+
+    def _grow(self):
+        self._capacity *= 2
+        self._rec_map.close()
+        self._rec_file.truncate(self._slot_offset(self._capacity))
+        self._rec_map = mmap.mmap(self._rec_file.fileno(), 0)
+        HEADER.pack_into(self._rec_map, 0, REC_MAGIC, self._generation, self._synced_count, self._capacity)
+
+    # Records
+    def _fields(self, slot: int) -> tuple:
+        """A record's fields, including changes still waiting for the next flush"""
+        packed = self._pending.get(slot)
+        if packed is not None:
+            return RECORD.unpack(packed)
+        return RECORD.unpack_from(self._rec_map, self._slot_offset(slot))
+
+    def _read(self, slot: int) -> Dict[str, Any]:
+        fields = self._fields(slot)
+        _, present, ints, version, _, _, blob_off, blob_len = fields[:8]
+        rest = json.loads(self._heap_slice(blob_off, blob_len))
+        return join_record(rest, fields[8:], present, ints, version)
+
+    def _write(self, slot: int, email_ref: Tuple[int, int], record: Dict[str, Any], old_blob=None):
+        numbers, present, ints, rest = split_record(record)
+        blob = json.dumps(rest, separators=(',', ':')).encode('utf-8')
+        if old_blob is not None and self._heap_slice(*old_blob) == blob:
+            blob_off = old_blob[0]  # only numbers changed: nothing to append
+        else:
+            blob_off = self._append_heap(blob)
+            if old_blob is not None:
+                self._garbage += old_blob[1]
+        self._pending[slot] = RECORD.pack(LIVE, present, ints, record[VERSION_KEY],
+                                          email_ref[0], email_ref[1], blob_off, len(blob), *numbers)
+
+    def _change(self, email: str, expected_version: Optional[int], mutate) -> bool:
+        with self._lock:
+            if not self._modify(email, expected_version, mutate):
+                return False
+        return self._persist()
+
+    def _modify(self, email: str, expected_version: Optional[int], mutate) -> bool:
+        """Rewrite one record in place (called holding _lock)"""
+        slot = self._index.get(email)
+        if slot is None:
+            return False
+        fields = self._fields(slot)
+        if expected_version is not None and fields[3] != expected_version:
+            raise VersionConflict(email)
+        record = self._read(slot)
+        mutate(record)
+        record[VERSION_KEY] = fields[3] + 1
+        self._write(slot, (fields[4], fields[5]), record, old_blob=(fields[6], fields[7]))
+        self._dirty = True
+        return True
+
+    # Persistence
+    def _sync(self):
+        """Make the heap durable, then copy pending records and the count into the mapping and msync it"""
+        self._heap_file.flush()
+        os.fsync(self._heap_file.fileno())
+        for slot, packed in self._pending.items():
+            offset = self._slot_offset(slot)
+            self._rec_map[offset:offset + RECORD.size] = packed
+        HEADER.pack_into(self._rec_map, 0, REC_MAGIC, self._generation, self._count, self._capacity)
+        self._rec_map.flush()
+        self._pending = {}
+        self._synced_count = self._count
+
+    def flush(self) -> bool:
+        with self._lock:
+            if not self._dirty:
+                return True
+            try:
+                self._sync()
+                self._dirty = False
+            except Exception as e:
+                print(f"Error saving users: {e}")
+                return False
+            if self._garbage > max(COMPACT_MIN_GARBAGE, self._heap_size - self._garbage):
+                self.compact()
+            return True
+
+    def _persist(self) -> bool:
+        if self.durability == "sync":
+            return self.flush()
+        if self.durability == "group":
+            return self._committer.commit()
+        self._wakeup.set()
+        return True
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._stop.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def compact(self):
+        """Rewrite everything into a fresh heap generation, dropping replaced blobs"""
+        with self._lock:
+            users = self.all()
+            generation = self._generation + 1
+            self._sync()  # if the rewrite fails, the reopened files still hold every change
+            self._close_files()
+            write_binary_files(self.base_path, users, generation)
+            self._open()
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        if self._committer is not None:
+            self._committer.close()
+            self._committer = None
+        self.flush()
+        with self._lock:
+            self._close_files()
+
+    # Record access
+    def all(self) -> Dict[str, Any]:
+        with self._lock:
+            return {email: self._read(slot) for email, slot in self._index.items()}
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            slot = self._index.get(email)
+            return None if slot is None else self._read(slot)
+
+    def emails(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
+
+    def version(self, email: str) -> Optional[int]:
+        with self._lock:
+            slot = self._index.get(email)
+            if slot is None:
+                return None
+            return self._fields(slot)[3]
+
+    def get_numbers(self, email: str) -> Optional[Dict[str, Any]]:
+        """Numeric fields only, keyed by dotted path, read without any JSON parsing"""
+        with self._lock:
+            slot = self._index.get(email)
+            if slot is None:
+                return None
+            fields = self._fields(slot)
+        return numbers_by_path(fields[8:], fields[1], fields[2])
+
+    def replace_all(self, users_data: Dict[str, Any]) -> bool:
+        with self._lock:
+            generation = self._generation + 1
+            try:
+                self._sync()
+            except Exception as e:
+                print(f"Error saving users: {e}")
+                return False
+            self._close_files()
+            try:
+                write_binary_files(self.base_path, users_data, generation)
+                return True
+            except Exception as e:
+                print(f"Error saving users: {e}")
+                return False
+            finally:
+                self._open()
+
+    def update(self, email: str, user_data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        return self._change(email, expected_version, lambda record: record.update(copy.deepcopy(user_data)))
+
+    def patch(self, email: str, changes: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        return self._change(email, expected_version, lambda record: apply_patch(record, copy.deepcopy(changes)))
+
+    def patch_many(self, changes_by_email: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Patch several users with a single flush; email -> False if the user is missing"""
+        with self._lock:
+            patched = {}
+            for email, changes in changes_by_email.items():
+                patched[email] = self._modify(email, None,
+                                              lambda record, c=changes: apply_patch(record, copy.deepcopy(c)))
+        if any(patched.values()) and not self._persist():
+            return {email: False for email in changes_by_email}
+        return patched
+
+    def _insert(self, email: str, user_data: Dict[str, Any]) -> bool:
+        """Append a new record (called holding _lock)"""
+        if email in self._index:
+            return False  # User already exists
+        record = copy.deepcopy(user_data)
+        record[VERSION_KEY] = 1
+        email_bytes = email.encode('utf-8')
+        email_off = self._append_heap(email_bytes)
+        if self._count == self._capacity:
+            self._grow()
+        slot = self._count
+        self._write(slot, (email_off, len(email_bytes)), record)
+        self._count += 1
+        self._index[email] = slot
+        self._dirty = True
+        return True
+
+    def create(self, email: str, user_data: Dict[str, Any]) -> bool:
+        with self._lock:
+            if not self._insert(email, user_data):
+                return False
+        return self._persist()
+
+    def create_many(self, users_data: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Create several users with a single flush; email -> False if it already existed"""
+        with self._lock:
+            created = {email: self._insert(email, data) for email, data in users_data.items()}
+        if any(created.values()) and not self._persist():
+            return {email: False for email in users_data}
+        return created
+
+
+def convert_json_to_binary(json_path: str, base_path: str) -> int:
+    """Build a binary store from users.json; returns the number of users converted"""
+    users = {}
+    if os.path.exists(json_path):
+        with open(json_path, 'r') as f:
+            users = json.load(f)
+    write_binary_files(base_path, users, 0)
+    return len(users)
+
+
+if __name__ == "__main__":
+    # python -m shared.binary_store users.json users
+    source, target = sys.argv[1:3] if len(sys.argv) >= 3 else ("users.json", "users")
+    print(f"Converted {convert_json_to_binary(source, target)} users from {source} into {target}.rec")
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from fastapi import Response
+
+from shared.async_database import db
+
+
+def version_etag(version: int) -> str:
+    """Strong ETag for a user record version (the representation is a function of it)"""
+    return f'"v{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison: a list of tags or "*", weak tags match too"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+async def not_modified(email: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """304 response if the client's copy of this user's data is current, else None.
+
+    Only the version stamp is read, so an unchanged record costs neither a
+    full record copy nor rebuilding the response model.
+    """
+    if not if_none_match:
+        return None
+    version = await db.get_user_version(email)
+    if version is None:
+        return None
+    etag = version_etag(version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
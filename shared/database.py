@@ -1,48 +1,210 @@
-import json
+import atexit
 import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
+
+from shared.binary_store import BinaryUserStore, convert_json_to_binary, numeric_fields
+from shared.email_index import EmailIndex
+from shared.group_commit import batch_stats
+from shared.history_store import HealthHistoryStore, History
+from shared.journal import JournaledUserStore
+from shared.sharded_store import ShardedUserStore
+from shared.sqlite_store import SqliteUserStore, migrate_json_to_sqlite
+from shared.user_store import UserStore, VersionConflict
 
 # Path to users.json (adjust if needed)
 USERS_FILE = "users.json"
+# SQLite database used when USERS_STORAGE=sqlite
+USERS_DB_FILE = "users.db"
+# Base name of the memory-mapped store (users.rec + users.heap.N) when USERS_STORAGE=binary
+USERS_BINARY_BASE = "users"
+
+# Storage settings (override through environment variables)
+# USERS_STORAGE: "json" (snapshot rewrites), "journal" (append-only log + compaction)
+# "sqlite" (WAL-mode database), "sharded" (users.00.json ... one file per hash shard)
+# or "binary" (mmap'd fixed-width records, single process only);
+# sqlite, sharded and binary import users.json on first start
+USERS_STORAGE = os.getenv("USERS_STORAGE", "json")
+# Number of shard files when USERS_STORAGE=sharded (change it with python -m shared.sharded_store)
+USERS_SHARDS = int(os.getenv("USERS_SHARDS", "64"))
+# USERS_DURABILITY: "write_behind" (default), "sync" or "group" (sync, but concurrent
+# writes share one flush)
+USERS_DURABILITY = os.getenv("USERS_DURABILITY", "write_behind")
+# Upper bound, in seconds, on how long a write-behind change stays memory-only
+USERS_FLUSH_INTERVAL = float(os.getenv("USERS_FLUSH_INTERVAL", "1.0"))
+# Group commit: how long, in seconds, a batch stays open and how many writes close it early
+# (API writes run on STORAGE_GROUP_WRITERS threads, see shared.async_database, which also caps a batch)
+USERS_GROUP_COMMIT_WINDOW = float(os.getenv("USERS_GROUP_COMMIT_WINDOW", "0.005"))
+USERS_GROUP_COMMIT_MAX_BATCH = int(os.getenv("USERS_GROUP_COMMIT_MAX_BATCH", "64"))
+# USERS_MULTIPROCESS=1 lets several uvicorn workers share the file backends: every
+# operation takes an advisory lock and sees the other workers' writes (sqlite is always safe)
+USERS_MULTIPROCESS = os.getenv("USERS_MULTIPROCESS", "0") == "1"
+# Journal records to accumulate before folding them into a new snapshot
+USERS_COMPACT_EVERY = int(os.getenv("USERS_COMPACT_EVERY", "1000"))
+
+_store = None
+_store_lock = threading.Lock()
+_history = None
+_email_index = None
+_email_index_loads = None
+
+def get_store():
+    """Return the process-wide user store, loading users.json on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _open_store()
+                atexit.register(_store.close)
+    return _store
+
+def _open_store():
+    if USERS_STORAGE == "binary":
+        if USERS_MULTIPROCESS:
+            raise ValueError("USERS_STORAGE=binary cannot be shared between processes")
+        if not os.path.exists(f"{USERS_BINARY_BASE}.rec"):
+            convert_json_to_binary(USERS_FILE, USERS_BINARY_BASE)
+        return BinaryUserStore(USERS_BINARY_BASE, durability=USERS_DURABILITY, flush_interval=USERS_FLUSH_INTERVAL,
+                               group_window=USERS_GROUP_COMMIT_WINDOW, group_max_batch=USERS_GROUP_COMMIT_MAX_BATCH)
+    if USERS_STORAGE == "sqlite":
+        if not os.path.exists(USERS_DB_FILE):
+            migrate_json_to_sqlite(USERS_FILE, USERS_DB_FILE)
+        return SqliteUserStore(USERS_DB_FILE, durability=USERS_DURABILITY)
+    if USERS_STORAGE == "sharded":
+        return ShardedUserStore(USERS_FILE, USERS_SHARDS, durability=USERS_DURABILITY,
+                                flush_interval=USERS_FLUSH_INTERVAL, multiprocess=USERS_MULTIPROCESS,
+                                group_window=USERS_GROUP_COMMIT_WINDOW, group_max_batch=USERS_GROUP_COMMIT_MAX_BATCH)
+    if USERS_STORAGE == "journal":
+        return JournaledUserStore(USERS_FILE, durability=USERS_DURABILITY,
+                                  flush_interval=USERS_FLUSH_INTERVAL, compact_every=USERS_COMPACT_EVERY,
+                                  multiprocess=USERS_MULTIPROCESS, group_window=USERS_GROUP_COMMIT_WINDOW,
+                                  group_max_batch=USERS_GROUP_COMMIT_MAX_BATCH)
+    if USERS_STORAGE == "json":
+        return UserStore(USERS_FILE, durability=USERS_DURABILITY, flush_interval=USERS_FLUSH_INTERVAL,
+                         multiprocess=USERS_MULTIPROCESS, group_window=USERS_GROUP_COMMIT_WINDOW,
+                         group_max_batch=USERS_GROUP_COMMIT_MAX_BATCH)
+    raise ValueError(f"Unknown USERS_STORAGE: {USERS_STORAGE}")
+
+def get_history() -> HealthHistoryStore:
+    """Return the process-wide health score history store"""
+    global _history
+    if _history is None:
+        with _store_lock:
+            if _history is None:
+                _history = HealthHistoryStore(durability=USERS_DURABILITY)
+    return _history
+
+def _store_loads() -> int:
+    # File stores count how often they (re)parsed their files; sqlite and binary never reload
+    return getattr(get_store(), "loads", 0)
+
+def _email_index_current() -> bool:
+    return _email_index is not None and not _email_index.stale and _email_index_loads == _store_loads()
+
+def get_email_index() -> EmailIndex:
+    """Return the normalized email index, (re)building it from the store's keys if needed.
+
+    It is rebuilt whenever the store re-read its files, e.g. after the
+    Streamlit pages added users to users.json.
+    """
+    global _email_index, _email_index_loads
+    store = get_store()
+    if not _email_index_current():
+        with _store_lock:
+            if not _email_index_current():
+                loads = _store_loads()  # read first: a reload during emails() triggers another rebuild
+                _email_index, _email_index_loads = EmailIndex.build(store.emails()), loads
+    return _email_index
+
+def cached_email_index() -> Optional[EmailIndex]:
+    """The email index if it is built and current, without touching storage"""
+    if _store is None or not _email_index_current():
+        return None
+    return _email_index
+
+def resolve_email(email: str) -> str:
+    """Storage key for an email as typed, including keys other processes added"""
+    if not email_index_is_complete():
+        # Any store access makes a file store notice outside writes (and bump its load count)
+        get_store().version(email)
+    return get_email_index().resolve(email)
+
+def email_index_is_complete() -> bool:
+    """Whether every registration passes through this process, so the index's "no" is final.
+
+    Other uvicorn workers (USERS_MULTIPROCESS) and the Streamlit pages
+    (USERS_STORAGE=json) add users this process only sees in storage.
+    """
+    return not USERS_MULTIPROCESS and USERS_STORAGE != "json"
 
 def load_users() -> Dict[str, Any]:
-    """Load all users from JSON file"""
-    try:
-        if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception as e:
-        print(f"Error loading users: {e}")
-        return {}
+    """Load all users"""
+    return get_store().all()
 
 def save_users(users_data: Dict[str, Any]) -> bool:
-    """Save users to JSON file"""
-    try:
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users_data, f, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error saving users: {e}")
-        return False
+    """Replace all users"""
+    return get_store().replace_all(users_data)
 
 def get_user_by_email(email: str) -> Dict[str, Any]:
     """Get a specific user by email"""
-    users = load_users()
-    return users.get(email)
+    return get_store().get(email)
+
+def get_user_numbers(email: str) -> Optional[Dict[str, Any]]:
+    """Numeric fields of a user by dotted path ("weight", "health_data.overall_score").
+
+    The binary backend reads them from the fixed-width record without any
+    JSON parsing; other backends pick them out of the full record.
+    """
+    store = get_store()
+    if isinstance(store, BinaryUserStore):
+        return store.get_numbers(email)
+    record = store.get(email)
+    return None if record is None else numeric_fields(record)
+
+def get_user_version(email: str) -> Optional[int]:
+    """Version stamp of a user's record, bumped on every write (None if the user is missing)"""
+    return get_store().version(email)
+
+def update_user(email: str, user_data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+    """Update a specific user's data.
+
+    Pass the `_version` read with the record as expected_version to make the
+    update conditional; VersionConflict is raised if someone wrote in between.
+    """
+    return get_store().update(email, user_data, expected_version)
 
-def update_user(email: str, user_data: Dict[str, Any]) -> bool:
-    """Update a specific user's data"""
-    users = load_users()
-    if email in users:
-        users[email].update(user_data)
-        return save_users(users)
-    return False
+def patch_user(email: str, changes: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+    """Set only the given fields; nested fields use dotted paths ("health_data.overall_score")"""
+    return get_store().patch(email, changes, expected_version)
+
+def patch_users(changes_by_email: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+    """Patch several users with one storage write; email -> False if the user is missing"""
+    return get_store().patch_many(changes_by_email)
 
 def create_user(email: str, user_data: Dict[str, Any]) -> bool:
     """Create a new user"""
-    users = load_users()
-    if email in users:
-        return False  # User already exists
-    users[email] = user_data
-    return save_users(users)
+    return get_store().create(email, user_data)
+
+def create_users(users_data: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+    """Create several users with one storage write; email -> False if it already existed"""
+    return get_store().create_many(users_data)
+
+def flush_users() -> bool:
+    """Force pending writes to disk"""
+    return get_store().flush()
+
+def append_health_history(email: str, values: Dict[str, float]) -> bool:
+    """Record one health score submission (raw inputs and scores) with the current time"""
+    return get_history().append(email, values)
+
+def get_health_history(email: str, start: Optional[float] = None, end: Optional[float] = None) -> History:
+    """A user's submissions between two epoch timestamps (inclusive, either optional)"""
+    return get_history().query(email, start, end)
+
+def get_storage_metrics() -> Dict[str, Any]:
+    """Storage settings and group-commit batch sizes seen so far"""
+    return {
+        "storage": USERS_STORAGE,
+        "durability": USERS_DURABILITY,
+        "group_commit": batch_stats.snapshot(),
+    }
@@ -0,0 +1,87 @@
+import hashlib
+import math
+import threading
+from typing import Dict, Iterable
+
+# False-positive rate of the "might this email be registered?" filter
+BLOOM_ERROR_RATE = 0.01
+# Filters are sized for at least this many emails, and twice the count at build time
+MIN_CAPACITY = 100_000
+
+
+def normalize_email(email: str) -> str:
+    """Canonical form used as the storage key: "  A@X.com " -> "a@x.com\""""
+    return email.strip().lower()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (k positions by double hashing one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class EmailIndex:
+    """In-memory view of which normalized emails are registered.
+
+    New accounts are stored under their normalized email. Records created
+    before normalization may have mixed-case keys; `aliases` maps their
+    normalized form back to the stored key, so lookups are case-insensitive
+    either way. A Bloom filter over all normalized emails answers most
+    "is this email free?" checks without storage: a negative is definite
+    when every registration goes through this process (otherwise, and for
+    any positive, a lookup confirms it).
+
+    Built from the store's keys on startup; once more emails were added
+    than the filter was sized for, `stale` asks the owner to rebuild it.
+    """
+
+    def __init__(self, capacity: int = MIN_CAPACITY):
+        self.bloom = BloomFilter(capacity)
+        self.aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, emails: Iterable[str]) -> "EmailIndex":
+        emails = list(emails)
+        index = cls(max(MIN_CAPACITY, 2 * len(emails)))
+        for email in emails:
+            index.add(email)
+        return index
+
+    @property
+    def stale(self) -> bool:
+        return self.bloom.count > self.bloom.capacity
+
+    def add(self, stored_key: str):
+        normalized = normalize_email(stored_key)
+        with self._lock:
+            self.bloom.add(normalized)
+            if stored_key != normalized:
+                self.aliases.setdefault(normalized, stored_key)
+
+    def might_exist(self, email: str) -> bool:
+        return normalize_email(email) in self.bloom
+
+    def resolve(self, email: str) -> str:
+        """Storage key for email: the legacy mixed-case key if there is one, else the normalized email"""
+        normalized = normalize_email(email)
+        return self.aliases.get(normalized, normalized)
@@ -0,0 +1,92 @@
+import json
+import os
+import random
+import threading
+from typing import Dict, Any, Iterable, List, Optional
+
+# Canned answers per intent, tried in this order; CHAT_TEMPLATES (JSON) replaces or adds intents
+DEFAULT_CHAT_TEMPLATES = {
+    "capabilities": [
+        "Hi! I'm your health assistant. I can help you understand symptoms, suggest what to do next, "
+        "and answer general questions about health, diet, sleep and exercise. "
+        "You can also use the symptom checker, your health score and personalized recommendations. "
+        "What would you like to know?",
+    ],
+    "greeting": [
+        "Hello! I'm your health assistant. How can I help you with your health today?",
+        "Hi there! How are you feeling today? Tell me what's on your mind about your health.",
+        "Hello! Feel free to ask me about symptoms, healthy habits or anything health related.",
+    ],
+}
+CHAT_TEMPLATES: Dict[str, List[str]] = {**DEFAULT_CHAT_TEMPLATES, **json.loads(os.getenv("CHAT_TEMPLATES", "{}"))}
+# Share of eligible messages answered from templates: 1 = all, 0 = off, in between = A/B split
+CHAT_TEMPLATE_SHARE = float(os.getenv("CHAT_TEMPLATE_SHARE", "1.0"))
+# Words besides the matched keywords a message may have and still count as trivial ("hello there")
+CHAT_TEMPLATE_MAX_EXTRA_WORDS = int(os.getenv("CHAT_TEMPLATE_MAX_EXTRA_WORDS", "2"))
+
+
+class TemplateResponder:
+    """Answers trivial chat messages (greetings, "what can you do") without calling the LLM.
+
+    A message is eligible when every intent it mentions has templates and
+    it has at most `max_extra_words` other words, so "hi" qualifies but
+    "hi, what should I eat for diabetes?" does not. Eligible messages are
+    served from templates with probability `share`; the rest are held out
+    and go to the LLM as the control arm of an A/B comparison.
+    """
+
+    def __init__(self, templates: Dict[str, List[str]] = CHAT_TEMPLATES, share: float = CHAT_TEMPLATE_SHARE,
+                 max_extra_words: int = CHAT_TEMPLATE_MAX_EXTRA_WORDS):
+        self.templates = {intent: answers for intent, answers in templates.items() if answers}
+        self.share = share
+        self.max_extra_words = max_extra_words
+        self._lock = threading.Lock()
+        self.stats = {"eligible": 0, "served": 0, "held_out": 0}
+
+    def respond(self, intents: Iterable[str], extra_words: int) -> Optional[str]:
+        """Template answer for a message with these intents, or None to ask the LLM"""
+        intents = set(intents)
+        if not intents or extra_words > self.max_extra_words or not intents <= self.templates.keys():
+            return None
+        serve = self.share >= 1 or random.random() < self.share
+        with self._lock:
+            self.stats["eligible"] += 1
+            self.stats["served" if serve else "held_out"] += 1
+        if not serve:
+            return None
+        intent = next(intent for intent in self.templates if intent in intents)
+        return random.choice(self.templates[intent])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "share": self.share}
+
+
+class TierMetrics:
+    """Count and total latency of chat answers per serving tier (template, semantic cache, llm)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, List[float]] = {}  # tier -> [count, seconds]
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            totals = self._tiers.setdefault(tier, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            answered = sum(count for count, _ in self._tiers.values())
+            return {
+                tier: {
+                    "count": count,
+                    "share": round(count / answered, 3),
+                    "avg_ms": round(seconds / count * 1000, 3),
+                }
+                for tier, (count, seconds) in self._tiers.items()
+            }
+
+
+template_responder = TemplateResponder()
+chat_tiers = TierMetrics()
@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Callable, Dict, Any, List
+
+# Upper bounds of the batch-size histogram buckets (last bucket is open-ended)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class BatchStats:
+    """Process-wide counters describing the batches group commit achieved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.batches = 0
+            self.commits = 0
+            self.failed_batches = 0
+            self.max_batch = 0
+            self.last_batch = 0
+            self.histogram = [0] * (len(BATCH_BUCKETS) + 1)
+
+    def record(self, size: int, ok: bool):
+        with self._lock:
+            self.batches += 1
+            self.commits += size
+            self.failed_batches += 0 if ok else 1
+            self.max_batch = max(self.max_batch, size)
+            self.last_batch = size
+            for i, bound in enumerate(BATCH_BUCKETS):
+                if size <= bound:
+                    self.histogram[i] += 1
+                    break
+            else:
+                self.histogram[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"<={bound}" for bound in BATCH_BUCKETS] + [f">{BATCH_BUCKETS[-1]}"]
+            return {
+                "batches": self.batches,
+                "commits": self.commits,
+                "failed_batches": self.failed_batches,
+                "avg_batch": round(self.commits / self.batches, 2) if self.batches else 0,
+                "max_batch": self.max_batch,
+                "last_batch": self.last_batch,
+                "histogram": dict(zip(labels, self.histogram)),
+            }
+
+
+batch_stats = BatchStats()
+
+
+class _Waiter:
+    __slots__ = ("done", "ok")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+
+
+class GroupCommitter:
+    """Makes concurrent writers share one durable flush.
+
+    A writer applies its change in memory and then calls `commit()`, which
+    blocks until a flush that started after the change has finished. The
+    first waiter opens a batch; it closes after `window` seconds or as soon
+    as `max_batch` writers are waiting, and one `flush()` call covers them all.
+    Each writer blocks its own thread until then, so a batch never holds
+    more writes than there are threads calling `commit()`.
+    """
+
+    def __init__(self, flush: Callable[[], bool], window: float = 0.005, max_batch: int = 64,
+                 stats: BatchStats = batch_stats):
+        self._flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self._stats = stats
+        self._cond = threading.Condition()
+        self._waiting: List[_Waiter] = []
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="users-group-commit", daemon=True)
+        self._thread.start()
+
+    def commit(self) -> bool:
+        """Block until the caller's change is durable; returns whether the flush succeeded"""
+        waiter = _Waiter()
+        with self._cond:
+            if self._stopped:
+                return self._flush()
+            self._waiting.append(waiter)
+            self._cond.notify()
+        waiter.done.wait()
+        return waiter.ok
+
+    def _next_batch(self) -> List[_Waiter]:
+        with self._cond:
+            while not self._waiting and not self._stopped:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._waiting) < self.max_batch and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._waiting = self._waiting, []
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return  # stopped with nobody waiting
+            try:
+                ok = self._flush()
+            except Exception as e:
+                print(f"Error in group commit: {e}")
+                ok = False
+            self._stats.record(len(batch), ok)
+            for waiter in batch:
+                waiter.ok = ok
+                waiter.done.set()
+
+    def close(self):
+        """Commit whatever is waiting, then stop the commit thread"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
@@ -0,0 +1,128 @@
+import bisect
+import hashlib
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+# Directory holding one <sha1(email)>.hist file per user
+HISTORY_DIR = os.getenv("HEALTH_HISTORY_DIR", "history")
+# Users whose columns stay loaded in memory
+HISTORY_CACHE_USERS = int(os.getenv("HEALTH_HISTORY_CACHE_USERS", "256"))
+
+# Column order of each row; every value is stored as a float64
+COLUMNS = (
+    "timestamp",
+    "sleep_hours", "sleep_quality", "steps", "exercise_minutes", "activity_level",
+    "water_intake", "stress_level", "meditation_minutes",
+    "bmi_score", "sleep_score", "activity_score", "hydration_score", "stress_score",
+    "overall_score",
+)
+HEADER = struct.Struct("<4sHxx")  # magic, column count
+HIST_MAGIC = b"HIST"
+ROW = struct.Struct(f"<{len(COLUMNS)}d")
+
+
+class History:
+    """One user's submissions as array-backed columns, ordered by timestamp"""
+
+    def __init__(self):
+        self.columns = {name: array('d') for name in COLUMNS}
+        self.size = HEADER.size  # bytes of the file already loaded
+
+    def extend(self, data: bytes):
+        rows = array('d')
+        rows.frombytes(data)
+        for i, name in enumerate(COLUMNS):
+            self.columns[name].extend(rows[i::len(COLUMNS)])
+        self.size += len(data)
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def between(self, start: Optional[float] = None, end: Optional[float] = None) -> "History":
+        """Copy of the rows with start <= timestamp <= end, found by binary search"""
+        timestamps = self.columns["timestamp"]
+        lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+        hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+        window = History()
+        window.columns = {name: column[lo:hi] for name, column in self.columns.items()}
+        return window
+
+    def rows(self) -> Iterator[Dict[str, float]]:
+        columns = [self.columns[name] for name in COLUMNS]
+        for values in zip(*columns):
+            yield dict(zip(COLUMNS, values))
+
+
+def history_path(directory: str, email: str) -> str:
+    return os.path.join(directory, hashlib.sha1(email.encode('utf-8')).hexdigest() + ".hist")
+
+
+class HealthHistoryStore:
+    """Append-only health score history, one file per user.
+
+    Each submission is appended as a fixed-width row of float64 values (see
+    COLUMNS), so a range query only ever reads the requesting user's file.
+    Loaded files are split into one array per column and kept in a small
+    LRU; on each access only the bytes appended since the last read (by this
+    or another process) are loaded.
+    """
+
+    def __init__(self, directory: str = HISTORY_DIR, cache_users: int = HISTORY_CACHE_USERS,
+                 durability: str = "write_behind"):
+        self.directory = directory
+        self.cache_users = cache_users
+        self.durability = durability
+        self._cache: "OrderedDict[str, History]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _load(self, email: str) -> History:
+        """Cached columns for email, brought up to date with the file (called holding _lock)"""
+        history = self._cache.pop(email, None) or History()
+        self._cache[email] = history
+        if len(self._cache) > self.cache_users:
+            self._cache.popitem(last=False)
+
+        path = history_path(self.directory, email)
+        try:
+            with open(path, 'rb') as f:
+                if history.size == HEADER.size:
+                    magic, column_count = HEADER.unpack(f.read(HEADER.size))
+                    if magic != HIST_MAGIC or column_count != len(COLUMNS):
+                        raise ValueError(f"{path} is not a health history file")
+                f.seek(history.size)
+                data = f.read()
+        except FileNotFoundError:
+            return history
+        # Ignore a partially written last row
+        history.extend(data[:len(data) - len(data) % ROW.size])
+        return history
+
+    def append(self, email: str, values: Dict[str, float], timestamp: Optional[float] = None) -> bool:
+        """Record one submission; columns missing from values are stored as NaN"""
+        row = [float(values.get(name, "nan")) for name in COLUMNS]
+        row[0] = time.time() if timestamp is None else timestamp
+        path = history_path(self.directory, email)
+        try:
+            with self._lock:
+                with open(path, 'ab') as f:
+                    if f.tell() == 0:
+                        f.write(HEADER.pack(HIST_MAGIC, len(COLUMNS)))
+                    f.write(ROW.pack(*row))
+                    f.flush()
+                    if self.durability != "write_behind":
+                        os.fsync(f.fileno())
+            return True
+        except Exception as e:
+            print(f"Error saving health history: {e}")
+            return False
+
+    def query(self, email: str, start: Optional[float] = None, end: Optional[float] = None) -> History:
+        """Rows with start <= timestamp <= end (epoch seconds, either bound optional)"""
+        with self._lock:
+            return self._load(email).between(start, end)
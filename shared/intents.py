@@ -0,0 +1,77 @@
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+_word = re.compile(r"\w+")
+
+
+def normalize_phrase(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex for every word sequence in a trie; shared prefixes are matched once.
+
+    A key of "" marks the end of a phrase. Continuing a phrase is optional
+    and greedy there, so "sore throat" wins over "sore".
+    """
+    ends = "" in node
+    branches = []
+    for char in sorted(c for c in node if c):
+        branches.append((r"\s+" if char == " " else re.escape(char)) + _trie_pattern(node[char]))
+    if not branches:
+        return ""
+    if len(branches) == 1 and not ends:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")" + ("?" if ends else "")
+
+
+class IntentRouter:
+    """Finds every intent a message mentions in one regex pass.
+
+    `intents` maps an intent name to its keywords and synonyms. All phrases
+    are compiled into a single regex trie, anchored on word boundaries, so
+    "hi" matches "Hi there" but not "this" or "chip", and a message can
+    carry several intents at once. Any whitespace in a message matches the
+    single space of a multi-word phrase. Messages are lowercased once up
+    front; a case-sensitive pattern runs about twice as fast as IGNORECASE.
+    """
+
+    def __init__(self, intents: Dict[str, Iterable[str]]):
+        self.phrases: Dict[str, Set[str]] = {}
+        for intent, phrases in intents.items():
+            for phrase in phrases:
+                self.phrases.setdefault(normalize_phrase(phrase), set()).add(intent)
+        trie: Dict[str, dict] = {}
+        for phrase in self.phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self.pattern = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)") if trie else None
+
+    def _intents(self, matched: str) -> Set[str]:
+        # Only multi-word phrases matched with unusual whitespace need normalizing
+        return self.phrases.get(matched) or self.phrases[normalize_phrase(matched)]
+
+    def matches(self, text: str) -> List[Tuple[str, str]]:
+        """(intent, matched phrase) for each keyword occurrence, in message order"""
+        if self.pattern is None:
+            return []
+        found = []
+        for matched in self.pattern.findall(text.lower()):
+            found.extend((intent, normalize_phrase(matched)) for intent in sorted(self._intents(matched)))
+        return found
+
+    def route(self, text: str) -> Set[str]:
+        """Names of all intents the message mentions"""
+        if self.pattern is None:
+            return set()
+        return {intent for matched in self.pattern.findall(text.lower()) for intent in self._intents(matched)}
+
+    def extra_words(self, text: str) -> int:
+        """Number of words in the message that are not part of a matched phrase"""
+        text = text.lower()
+        if self.pattern is not None:
+            text = self.pattern.sub(" ", text)
+        return len(_word.findall(text))
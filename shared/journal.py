@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from shared.user_store import UserStore, apply_patch
+
+
+def apply_record(users: Dict[str, Any], op: str, email: Optional[str], data: Any):
+    """Apply one journal record to a users dict (same semantics as the live store)"""
+    if op == "create":
+        users[email] = data
+    elif op == "update":
+        if email in users:
+            users[email].update(data)
+    elif op == "patch":
+        if email in users:
+            apply_patch(users[email], data)
+    elif op == "replace":
+        users.clear()
+        users.update(data)
+
+
+class JournaledUserStore(UserStore):
+    """User store that appends one compact record per change to `<path>.log`.
+
+    Patches are journaled as just the changed paths, so a login costs one
+    short line rather than the whole user record.
+
+    Startup loads the last snapshot (`path`) and replays the log on top of it.
+    A background compactor folds the log into a fresh snapshot once it holds
+    `compact_every` records. While compacting, the current log is rotated to
+    `<path>.log.1` so that snapshot + log.1 + log always describes the full
+    state, whatever point a crash happens at.
+
+    In multi-process mode each process replays only the log tail other
+    processes appended since its last look, so sharing the store stays
+    O(record) per write; a rotated log (another process compacted) triggers
+    a full reload.
+    """
+
+    def __init__(self, path: str, durability: str = "write_behind", flush_interval: float = 1.0,
+                 compact_every: int = 1000, multiprocess: bool = False, group_window: float = 0.005,
+                 group_max_batch: int = 64):
+        self.log_path = f"{path}.log"
+        self.rotated_log_path = f"{path}.log.1"
+        self.compact_every = compact_every
+        self._log = None
+        self._log_ino = None
+        self._log_offset = 0
+        self._log_records = 0
+        self._compact_lock = threading.Lock()
+        super().__init__(path, durability=durability, flush_interval=flush_interval,
+                         multiprocess=multiprocess, group_window=group_window, group_max_batch=group_max_batch)
+
+        self._compact_wakeup = threading.Event()
+        self._compactor = threading.Thread(target=self._compact_loop, name="users-compactor", daemon=True)
+        self._compactor.start()
+
+    def _wants_flusher(self) -> bool:
+        # Even in multi-process mode, write-behind fsyncs are batched by the flusher
+        return self.durability == "write_behind"
+
+    def _watches_file(self) -> bool:
+        # Only other processes append to the log; a single process already holds every record
+        return self.multiprocess
+
+    # Loading
+    def _load(self) -> Dict[str, Any]:
+        users = super()._load()
+        self._log_records = 0
+        for path in (self.rotated_log_path, self.log_path):
+            count, _ = self._replay(path, users)
+            self._log_records += count
+        self._open_log()
+        return users
+
+    def _replay(self, path: str, users: Dict[str, Any], offset: int = 0) -> Tuple[int, int]:
+        """Apply complete records from `offset` on; returns (records applied, offset reached)"""
+        if not os.path.exists(path):
+            return 0, 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        count = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # still being written, or torn by a crash
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn record from a crash mid-append; the change never completed
+                print(f"Skipping unreadable journal record in {path}")
+                continue
+            apply_record(users, record["op"], record.get("email"), record.get("data"))
+            count += 1
+        return count, offset
+
+    def _open_log(self):
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_path, 'a+b')
+        size = os.fstat(self._log.fileno()).st_size
+        if size:
+            self._log.seek(size - 1)
+            if self._log.read(1) != b"\n":
+                # Terminate a torn record so the next append starts on its own line
+                self._log.write(b"\n")
+                self._log.flush()
+        st = os.fstat(self._log.fileno())
+        self._log_ino = st.st_ino
+        self._log_offset = st.st_size
+
+    def _refresh(self):
+        st = self._stat(self.log_path)
+        if st is None or st[0] != self._log_ino or st[2] < self._log_offset:
+            # Another process compacted: start over from the new snapshot
+            self._users = self._load()
+        elif st[2] > self._log_offset:
+            count, self._log_offset = self._replay(self.log_path, self._users, self._log_offset)
+            self._log_records += count
+
+    # Persistence
+    def _record(self, op: str, email: Optional[str], data: Any):
+        line = json.dumps({"op": op, "email": email, "data": data}, separators=(',', ':'))
+        self._log.write(line.encode('utf-8') + b"\n")
+        self._log_records += 1
+        self._dirty = True
+
+    def _publish(self) -> bool:
+        """Multi-process mode: make the appended record visible before the lock is released.
+
+        The fsync happens here for "sync"; other modes leave the store dirty
+        for the flusher or group committer.
+        """
+        try:
+            self._log.flush()
+            if self.durability == "sync":
+                os.fsync(self._log.fileno())
+                self._dirty = False
+            self._log_offset = os.fstat(self._log.fileno()).st_size
+        except Exception as e:
+            print(f"Error writing users journal: {e}")
+            self._log_ino = None  # force a full reload on next access
+            return False
+        self._maybe_compact()
+        return True
+
+    def flush(self) -> bool:
+        """fsync appended records; schedule compaction when the log is long enough"""
+        with self._lock:
+            if not self._dirty:
+                return True
+            self._dirty = False
+            try:
+                self._log.flush()
+                fd = os.dup(self._log.fileno())
+            except Exception as e:
+                print(f"Error writing users journal: {e}")
+                self._dirty = True
+                return False
+        # fsync outside the lock so appends carry on while the disk catches up
+        try:
+            os.fsync(fd)
+        except Exception as e:
+            print(f"Error writing users journal: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+        finally:
+            os.close(fd)
+        self._maybe_compact()
+        return True
+
+    def _maybe_compact(self):
+        if self._log_records >= self.compact_every:
+            self._compact_wakeup.set()
+
+    def _rotate_log(self):
+        """Move the live log aside so new records start in an empty file"""
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._log.close()
+        self._log = None
+        if os.path.exists(self.rotated_log_path):
+            # A previous compaction did not finish: keep its records ahead of ours
+            with open(self.log_path, 'rb') as src, open(self.rotated_log_path, 'ab') as dst:
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.log_path)
+        else:
+            os.replace(self.log_path, self.rotated_log_path)
+        self._open_log()
+        self._log_records = 0
+        self._dirty = False
+
+    def _write_compacted(self, payload: str) -> bool:
+        try:
+            self._disk_state = self._write_snapshot(payload)
+            os.remove(self.rotated_log_path)
+            return True
+        except Exception as e:
+            # log.1 is kept, so the next startup or compaction still sees these records
+            print(f"Error compacting users journal: {e}")
+            return False
+
+    def compact(self) -> bool:
+        """Fold the journal into a new snapshot and atomically swap it in"""
+        with self._compact_lock:
+            with self._lock, self._locked_file():
+                if self.multiprocess:
+                    self._refresh()
+                try:
+                    self._rotate_log()
+                except Exception as e:
+                    print(f"Error rotating users journal: {e}")
+                    if self._log is None:
+                        self._open_log()
+                    return False
+                payload = json.dumps(self._users, indent=4)
+                if self.multiprocess:
+                    # Another process may rotate into log.1 as soon as the lock drops
+                    return self._write_compacted(payload)
+            return self._write_compacted(payload)
+
+    def _compact_loop(self):
+        while not self._stop.is_set():
+            self._compact_wakeup.wait()
+            self._compact_wakeup.clear()
+            if self._stop.is_set():
+                break
+            self.compact()
+
+    def close(self):
+        self._stop.set()
+        self._compact_wakeup.set()
+        self._compactor.join()
+        super().close()
+        with self._lock:
+            self._log.close()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Seconds a cached completion stays valid
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+# Memory budget for cached completions (prompt keys + response text)
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# SQLite file for the on-disk tier that survives restarts ("" disables it)
+LLM_CACHE_DISK = os.getenv("LLM_CACHE_DISK", "")
+# Rows kept in the disk tier (those expiring soonest are dropped first)
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))
+# Puts between disk-tier cleanups
+DISK_PRUNE_EVERY = 500
+
+# Approximate bookkeeping cost of one memory entry besides key and text
+ENTRY_OVERHEAD = 64
+
+_whitespace = re.compile(r"\s+")
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    text TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompts differing only in letter case or whitespace share a cache entry"""
+    return _whitespace.sub(" ", prompt).strip().casefold()
+
+
+def cache_key(model: str, params: Dict[str, Any], prompt: str) -> str:
+    material = json.dumps([model, params, normalize_prompt(prompt)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """TTL + LRU cache of LLM completions, bounded by bytes, with an optional disk tier.
+
+    The memory tier is an OrderedDict in recency order; inserting past
+    `max_bytes` evicts least recently used entries, and expired entries are
+    dropped when looked up. The disk tier (SQLite) is consulted on memory
+    misses and filled on every put; its methods block, so async callers
+    should run them in a thread.
+    """
+
+    def __init__(self, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 disk_path: str = LLM_CACHE_DISK, disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()  # key -> (expires, text, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        self._disk_puts = 0
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "expirations": 0}
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, isolation_level=None, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(DISK_SCHEMA)
+            self._disk.execute("DELETE FROM completions WHERE expires < ?", (time.time(),))
+
+    @property
+    def has_disk(self) -> bool:
+        return self._disk is not None
+
+    # Memory tier
+    def get(self, key: str) -> Optional[str]:
+        """Cached text from memory; counts a miss only when there is no disk tier to ask next"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                if self._disk is None:
+                    self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, text: str, expires: Optional[float] = None):
+        expires = time.time() + self.ttl if expires is None else expires
+        size = len(key) + len(text.encode('utf-8')) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, text, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key)[2]
+
+    # Disk tier (blocking)
+    def get_disk(self, key: str) -> Optional[str]:
+        """Look key up on disk after a memory miss, promoting a hit into memory"""
+        with self._disk_lock:
+            row = self._disk.execute("SELECT expires, text FROM completions WHERE key = ? AND expires >= ?",
+                                     (key, time.time())).fetchone()
+        with self._lock:
+            self.stats["disk_hits" if row else "misses"] += 1
+        if row is None:
+            return None
+        self.put(key, row[1], expires=row[0])
+        return row[1]
+
+    def put_disk(self, key: str, text: str):
+        with self._disk_lock:
+            self._disk.execute("INSERT OR REPLACE INTO completions (key, expires, text) VALUES (?, ?, ?)",
+                               (key, time.time() + self.ttl, text))
+            self._disk_puts += 1
+            if self._disk_puts % DISK_PRUNE_EVERY == 0:
+                self._disk.execute("DELETE FROM completions WHERE expires < ?", (time.time(),))
+                self._disk.execute("DELETE FROM completions WHERE key IN (SELECT key FROM completions "
+                                   "ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.disk_max_entries,))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round((self.stats["hits"] + self.stats["disk_hits"]) / lookups, 3) if lookups else 0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk": self.disk_path or None,
+            }
+
+    def close(self):
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.close()
+                self._disk = None
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+from typing import Dict, Any, AsyncIterator, Optional
+
+import httpx
+
+from shared.llm_cache import ResponseCache, cache_key, LLM_CACHE_MAX_BYTES
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Gemini API Configuration (without a key the chatbot and symptom checker answer with an error)
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+# Seconds to establish a connection, and to wait for the model's answer
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+# Connection pool: total connections, and idle keep-alive connections kept open
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+# Gemini generationConfig sent with every call (JSON, e.g. '{"temperature": 0.2}'); part of the cache key
+GEMINI_GENERATION_CONFIG = json.loads(os.getenv("GEMINI_GENERATION_CONFIG", "{}"))
+
+
+class LLMError(Exception):
+    """A Gemini call failed; the message is safe to return to API clients"""
+
+
+def prompt_body(prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    if generation_config:
+        body["generationConfig"] = generation_config
+    return body
+
+
+def response_text(result: Dict[str, Any]) -> str:
+    try:
+        return result["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        raise LLMError("Unexpected response format from AI service")
+
+
+class LLMClient:
+    """Shared async Gemini client for the chatbot and symptom checker.
+
+    One httpx.AsyncClient per process keeps TLS connections alive between
+    calls (HTTP/2 when the h2 package is installed) and bounds both the
+    pool size and every call's connect/read time. `start()`/`close()` are
+    wired to the app's startup/shutdown hooks; the first call also starts
+    the client if needed.
+
+    Successful answers are kept in `cache` (when given), keyed by the
+    normalized prompt, model and generation config, so repeated questions
+    skip the network round trip. Concurrent `generate` calls with the same
+    key share one upstream request (single flight).
+    """
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, model: str = GEMINI_MODEL,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_connections: int = LLM_MAX_CONNECTIONS, max_keepalive: int = LLM_MAX_KEEPALIVE,
+                 generation_config: Optional[Dict[str, Any]] = None, cache: Optional[ResponseCache] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key
+        self.model = model
+        self.generation_config = generation_config or {}
+        self.cache = cache
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, _Flight] = {}
+        self.stats = {"upstream": 0, "coalesced": 0}
+
+    def url(self, method: str) -> str:
+        return f"{GEMINI_BASE_URL}/{self.model}:{method}"
+
+    async def start(self):
+        if not self.api_key:
+            print("GEMINI_API_KEY is not set: the chatbot and symptom checker will return errors")
+            return
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE and self._transport is None,
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={"x-goog-api-key": self.api_key},
+                transport=self._transport,
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def cache_key(self, prompt: str) -> str:
+        return cache_key(self.model, self.generation_config, prompt)
+
+    async def cached(self, key: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        text = self.cache.get(key)
+        if text is None and self.cache.has_disk:
+            text = await asyncio.to_thread(self.cache.get_disk, key)
+        return text
+
+    async def remember(self, key: str, text: str):
+        if self.cache is None:
+            return
+        self.cache.put(key, text)
+        if self.cache.has_disk:
+            await asyncio.to_thread(self.cache.put_disk, key, text)
+
+    async def generate(self, prompt: str) -> str:
+        """Text of Gemini's answer to prompt; raises LLMError on any failure.
+
+        The upstream call runs in its own task that every concurrent caller
+        with the same key awaits (shielded), so its result or error reaches
+        all of them. A caller being cancelled leaves the call running for
+        the others; only when the last one goes away is it cancelled.
+        """
+        key = self.cache_key(prompt)
+        text = await self.cached(key)
+        if text is not None:
+            return text
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(self._generate(prompt, key)))
+            flight.task.add_done_callback(lambda task: self._land(key, flight))
+            self.stats["upstream"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the answer any more; later callers start a new call
+                self._land(key, flight)
+                flight.task.cancel()
+
+    def _land(self, key: str, flight: "_Flight"):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()  # retrieved even if every waiter was cancelled
+
+    def _require_key(self):
+        if not self.api_key:
+            raise LLMError("GEMINI_API_KEY is not set")
+
+    async def _generate(self, prompt: str, key: str) -> str:
+        self._require_key()
+        await self.start()
+        try:
+            response = await self._client.post(self.url("generateContent"),
+                                               json=prompt_body(prompt, self.generation_config))
+        except httpx.HTTPError as e:
+            raise LLMError(f"Network error: {str(e) or type(e).__name__}")
+        if response.status_code != 200:
+            raise LLMError(f"AI service error: {response.status_code}")
+        try:
+            result = response.json()
+        except ValueError:
+            raise LLMError("Unexpected response format from AI service")
+        text = response_text(result)
+        await self.remember(key, text)
+        return text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Text chunks of Gemini's answer as streamGenerateContent produces them.
+
+        Each chunk is pulled from the connection only when the caller asks
+        for the next one; closing the iterator early (e.g. the client went
+        away) closes the upstream response. A cached answer arrives as a
+        single chunk; a fully streamed one is added to the cache.
+        """
+        key = self.cache_key(prompt)
+        text = await self.cached(key)
+        if text is not None:
+            yield text
+            return
+        self._require_key()
+        await self.start()
+        chunks = []
+        try:
+            async with self._client.stream("POST", self.url("streamGenerateContent"), params={"alt": "sse"},
+                                           json=prompt_body(prompt, self.generation_config)) as response:
+                if response.status_code != 200:
+                    raise LLMError(f"AI service error: {response.status_code}")
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    try:
+                        parts = json.loads(line[5:])["candidates"][0]["content"]["parts"]
+                    except (ValueError, KeyError, IndexError, TypeError):
+                        continue  # e.g. a final chunk carrying only finishReason/usage
+                    text = "".join(part.get("text", "") for part in parts)
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except httpx.HTTPError as e:
+            raise LLMError(f"Network error: {str(e) or type(e).__name__}")
+        if chunks:
+            await self.remember(key, "".join(chunks))
+
+
+class _Flight:
+    """An upstream generate call and how many callers are waiting on it"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+llm = LLMClient(generation_config=GEMINI_GENERATION_CONFIG,
+                cache=ResponseCache() if LLM_CACHE_MAX_BYTES > 0 else None)
@@ -0,0 +1,119 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# scrypt cost parameters for new hashes (memory use is about 128 * n * r bytes)
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+# Processes running the KDF, and how many hash/verify calls may wait for one of them
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "32"))
+# How the worker processes are started: by then the API runs storage and flusher threads,
+# and a forked copy of a threaded process can deadlock, so never "fork"
+PASSWORD_START_METHOD = os.getenv("PASSWORD_START_METHOD", "forkserver"
+                                  if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+# Unsalted SHA-256 hex digests written before the switch to scrypt
+LEGACY_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def scrypt_hash(password: str, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R,
+                p: int = PASSWORD_SCRYPT_P, salt: Optional[bytes] = None) -> str:
+    """"scrypt$n$r$p$<salt>$<key>" for password, with a fresh random salt"""
+    salt = os.urandom(SALT_BYTES) if salt is None else salt
+    key = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p,
+                         dklen=KEY_BYTES)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def legacy_hash(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def check_password(password: str, stored: str) -> bool:
+    """Compare password against a stored scrypt or legacy SHA-256 hash"""
+    if LEGACY_HASH.match(stored):
+        return hmac.compare_digest(legacy_hash(password), stored)
+    try:
+        scheme, n, r, p, salt, _ = stored.split("$")
+        if scheme != "scrypt":
+            return False
+        expected = scrypt_hash(password, int(n), int(r), int(p), base64.b64decode(salt))
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected, stored)
+
+
+def needs_rehash(stored: str) -> bool:
+    """True for legacy hashes and scrypt hashes made with other cost parameters"""
+    return not stored.startswith(f"scrypt${PASSWORD_SCRYPT_N}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}$")
+
+
+class PasswordHasher:
+    """Awaitable password hashing for the auth router.
+
+    scrypt deliberately burns tens of milliseconds of CPU, so it runs in a
+    process pool instead of on the event loop (or a thread, which would
+    still hold the GIL for Python-side work). At most `max_pending` calls
+    are queued for the pool; further callers wait on the loop for a slot.
+    Legacy SHA-256 hashes are cheap and are checked inline.
+
+    Call `start()` from the app's startup hook; the workers are started
+    with `start_method` (forkserver or spawn) rather than forked from the
+    threaded API process.
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING,
+                 start_method: str = PASSWORD_START_METHOD):
+        if start_method == "fork":
+            raise ValueError("Password workers must not be forked from the threaded API process")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.start_method = start_method
+        self._executor = None
+        self._slots = None
+
+    def start(self):
+        """Create the worker pool (later calls are no-ops)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers,
+                                                 mp_context=multiprocessing.get_context(self.start_method))
+
+    async def _run(self, func, *args):
+        self.start()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(scrypt_hash, password)
+
+    async def verify(self, password: str, stored: str) -> bool:
+        if LEGACY_HASH.match(stored):
+            return check_password(password, stored)
+        return await self._run(check_password, password, stored)
+
+    def shutdown(self):
+        """Wait for in-flight hashes to finish and stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._slots = None
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,146 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Per-route limits as "<requests>/<seconds>" for each key kind: "ip" (client
+# address) and "email" (the "email" field of the JSON body). A bucket holds
+# up to <requests> tokens and refills at <requests>/<seconds> per second.
+# Override with RATE_LIMITS='{"POST /api/auth/login": {"ip": "30/60"}}'.
+DEFAULT_RATE_LIMITS = {
+    "POST /api/auth/login": {"ip": "20/60", "email": "5/60"},
+    "POST /api/auth/register": {"ip": "10/60"},
+    "POST /api/auth/bulk-register": {"ip": "5/60"},
+    "POST /api/chatbot/chat": {"ip": "20/60"},
+    "POST /api/chatbot/chat/stream": {"ip": "20/60"},
+    "POST /api/symptom-checker/analyze": {"ip": "20/60"},
+}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("RATE_LIMITS", "{}"))}
+# Use the first X-Forwarded-For address as the client IP (only behind a trusted proxy)
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+# Buckets kept per limit; beyond that the least recently used one is dropped
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Largest request body read to find the email; bigger bodies skip the email limit
+MAX_BODY_PEEK = 64 * 1024
+
+
+def parse_limit(spec: str) -> Tuple[float, float]:
+    """"5/60" -> (capacity 5, refill 5/60 tokens per second)"""
+    count, seconds = spec.split("/")
+    return float(count), float(count) / float(seconds)
+
+
+class TokenBuckets:
+    """Token buckets for one limit, keyed by IP or email.
+
+    Each key maps to a (tokens, updated) pair that is refilled lazily when
+    the key is next seen. The table is an LRU of at most `max_keys`
+    buckets: each take is O(1), and the least recently seen key is dropped
+    when a new one arrives at the cap. A dropped bucket starts full again
+    if its key comes back, so size `max_keys` well above the number of
+    keys active within one refill period.
+    """
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Spend one token; returns 0 if allowed, else seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimitMiddleware:
+    """ASGI middleware rejecting over-limit requests with 429 before routing.
+
+    Only routes listed in `limits` are checked; the request body is read
+    (and replayed to the app) only for routes with an "email" limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, Dict[str, str]] = None):
+        self.app = app
+        self.limits = {route: {kind: TokenBuckets(*parse_limit(spec)) for kind, spec in kinds.items()}
+                       for route, kinds in (RATE_LIMITS if limits is None else limits).items()}
+
+    async def __call__(self, scope, receive, send):
+        buckets = self.limits.get(f"{scope.get('method')} {scope.get('path')}") if scope["type"] == "http" else None
+        if not buckets:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = 0.0
+        if "ip" in buckets:
+            retry_after = buckets["ip"].take(client_ip(scope))
+        if not retry_after and "email" in buckets:
+            body, receive = await read_body(receive)
+            email = body_email(body)
+            if email:
+                retry_after = buckets["email"].take(email)
+        if retry_after:
+            await reject(send, retry_after)
+            return
+        await self.app(scope, receive, send)
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+async def read_body(receive):
+    """Read up to MAX_BODY_PEEK bytes of the body; returns (body, receive that replays it)"""
+    messages = []
+    body = b""
+    more = True
+    while more and len(body) <= MAX_BODY_PEEK:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+    return (b"" if more else body), replay
+
+
+def body_email(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+async def reject(send, retry_after: float):
+    body = json.dumps({"detail": "Too many requests, please retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(retry_after)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,182 @@
+import itertools
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Cosine similarity a cached question needs to answer a new one (1.0 = same n-grams only)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Questions remembered per scope (least recently used dropped first), and for how long
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", os.getenv("LLM_CACHE_TTL", "3600")))
+# Hashed feature space; large so that distinct n-grams rarely collide
+SEMANTIC_DIMENSIONS = 1 << 20
+# Character n-gram lengths embedded
+NGRAM_SIZES = (3, 4, 5)
+
+# Words that change what a question means while barely changing its n-grams
+# ("no chest pain" / "chest pain", "type one" / "type two"); like numbers, they must match
+NEGATIONS = frozenset({"no", "not", "never", "without", "none", "nor", "nothing", "cannot"})
+QUALIFIERS = frozenset({
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "first", "second", "third", "once", "twice",
+    "left", "right", "upper", "lower", "front", "back",
+    "mild", "moderate", "severe", "acute", "chronic",
+    "before", "after", "more", "less", "high", "low",
+})
+
+_non_word = re.compile(r"[^\w]+")
+_number = re.compile(r"\d+(?:[.,]\d+)?")
+_token = re.compile(r"\w+(?:'\w+)?")
+
+Vector = Dict[int, float]
+
+
+def embed(text: str) -> Vector:
+    """Sparse L2-normalized vector of hashed character n-grams (log-scaled counts).
+
+    Words are padded with spaces so n-grams at word edges differ from
+    inner ones; paraphrases sharing word stems ("headache" / "head ache")
+    get overlapping features without any model or external service.
+    """
+    words = _non_word.sub(" ", text.casefold()).split()
+    counts: Dict[int, int] = {}
+    for word in words:
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            for i in range(max(1, len(padded) - n + 1)):
+                feature = zlib.crc32(padded[i:i + n].encode('utf-8')) & (SEMANTIC_DIMENSIONS - 1)
+                counts[feature] = counts.get(feature, 0) + 1
+    vector = {feature: 1 + math.log(count) for feature, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {feature: weight / norm for feature, weight in vector.items()} if norm else {}
+
+
+def qualifiers(text: str) -> Tuple[str, ...]:
+    """Numbers, negations (all counted as "not") and QUALIFIERS in text, sorted"""
+    found = _number.findall(text)
+    for token in _token.findall(text.casefold()):
+        if token in NEGATIONS or token.endswith("n't"):
+            found.append("not")
+        elif token in QUALIFIERS:
+            found.append(token)
+    return tuple(sorted(found))
+
+
+class _Scope:
+    """Entries of one scope plus an inverted index feature -> {entry id: weight}"""
+
+    def __init__(self):
+        # id -> (vector, answer, expires, qualifiers mentioned)
+        self.entries: "OrderedDict[int, Tuple[Vector, str, float, Tuple[str, ...]]]" = OrderedDict()
+        self.postings: Dict[int, Dict[int, float]] = {}
+
+    def add(self, entry_id: int, vector: Vector, answer: str, expires: float, mentioned: Tuple[str, ...]):
+        self.entries[entry_id] = (vector, answer, expires, mentioned)
+        for feature, weight in vector.items():
+            self.postings.setdefault(feature, {})[entry_id] = weight
+
+    def remove(self, entry_id: int):
+        vector = self.entries.pop(entry_id)[0]
+        for feature in vector:
+            posting = self.postings[feature]
+            del posting[entry_id]
+            if not posting:
+                del self.postings[feature]
+
+    def nearest(self, vector: Vector, mentioned: Tuple[str, ...], threshold: float) -> Tuple[Optional[int], float]:
+        """Most similar entry with the same qualifiers, among those that can reach threshold.
+
+        Query features are visited rarest first, collecting candidates from
+        their postings. Once the weight of the unvisited features has norm
+        below `threshold`, an entry sharing none of the visited ones cannot
+        reach it (Cauchy-Schwarz), so common n-grams are never scanned.
+        Candidates are then scored exactly.
+        """
+        features = sorted(vector, key=lambda feature: len(self.postings.get(feature, ())))
+        remaining = 1.0
+        candidates = set()
+        for feature in features:
+            if remaining < threshold * threshold:
+                break
+            candidates.update(self.postings.get(feature, ()))
+            remaining -= vector[feature] * vector[feature]
+        best, best_score = None, 0.0
+        for entry_id in candidates:
+            other, _, _, qualifiers_mentioned = self.entries[entry_id]
+            if qualifiers_mentioned != mentioned:
+                continue
+            score = sum(weight * other.get(feature, 0.0) for feature, weight in vector.items())
+            if score > best_score:
+                best, best_score = entry_id, score
+        return best, best_score
+
+
+class SemanticCache:
+    """Answers to free-text questions, found again by n-gram cosine similarity.
+
+    Questions are kept per scope (e.g. "symptom" vs "general" prompts), so
+    an answer is only reused for a question of the same kind. Each scope
+    keeps an inverted index over its embedded questions; a lookup scores
+    only entries sharing features with the query and returns the best
+    answer at or above `threshold`. Numbers, negations and qualifier words
+    (see QUALIFIERS) must match exactly, so "fever for 3 days" never reuses
+    the answer to "fever for 5 days", nor "no chest pain" that to "chest
+    pain".
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl: float = SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._scopes: Dict[str, _Scope] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def lookup(self, scope: str, question: str) -> Optional[str]:
+        vector = embed(question)
+        with self._lock:
+            index = self._scopes.get(scope)
+            while index is not None:
+                entry_id, score = index.nearest(vector, qualifiers(question), self.threshold)
+                if entry_id is None or score < self.threshold:
+                    break
+                if index.entries[entry_id][2] < time.time():
+                    index.remove(entry_id)
+                    self.stats["expirations"] += 1
+                    continue
+                index.entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                return index.entries[entry_id][1]
+            self.stats["misses"] += 1
+            return None
+
+    def add(self, scope: str, question: str, answer: str):
+        vector = embed(question)
+        if not vector:
+            return
+        with self._lock:
+            index = self._scopes.setdefault(scope, _Scope())
+            index.add(next(self._ids), vector, answer, time.time() + self.ttl, qualifiers(question))
+            while len(index.entries) > self.max_entries:
+                index.remove(next(iter(index.entries)))
+                self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0,
+                "threshold": self.threshold,
+                "entries": {scope: len(index.entries) for scope, index in self._scopes.items()},
+            }
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,92 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+from fastapi import Header, HTTPException, Depends
+
+from shared.async_database import db
+from shared.database import USERS_MULTIPROCESS
+
+# Signing key for session tokens; set it so tokens survive restarts and are
+# accepted by every uvicorn worker
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+# How long a token issued at login stays valid, in seconds
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(12 * 60 * 60)))
+# Recently verified (valid) tokens whose signature check is skipped
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "4096"))
+
+if not SESSION_SECRET:
+    if USERS_MULTIPROCESS:
+        # Each worker would sign with its own random key and reject the others' tokens
+        raise RuntimeError("SESSION_SECRET must be set when USERS_MULTIPROCESS=1")
+    print("SESSION_SECRET is not set: using a random key, sessions end on restart")
+    SESSION_SECRET = secrets.token_hex(32)
+_key = SESSION_SECRET.encode()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def issue_token(email: str, version: int, ttl: int = SESSION_TTL) -> str:
+    """Signed "<payload>.<signature>" token carrying the email and profile version"""
+    payload = _b64encode(json.dumps({"sub": email, "ver": version, "exp": int(time.time()) + ttl},
+                                    separators=(',', ':')).encode())
+    signature = hmac.new(_key, payload.encode(), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(signature)}"
+
+
+@lru_cache(maxsize=SESSION_CACHE_SIZE)
+def _verified_claims(token: str) -> Dict[str, Any]:
+    """Claims of a correctly signed token; raises ValueError otherwise (so failures are not cached)"""
+    payload, signature = token.split(".")
+    expected = hmac.new(_key, payload.encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(_b64decode(signature), expected):
+        raise ValueError("bad signature")
+    claims = json.loads(_b64decode(payload))
+    if not isinstance(claims, dict):
+        raise ValueError("claims are not an object")
+    return claims
+
+
+def _decode(token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a correctly signed token (expiry is checked by the caller)"""
+    try:
+        return _verified_claims(token)
+    except ValueError:
+        return None
+
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """Claims ({"sub", "ver", "exp"}) of a valid, unexpired token, else None"""
+    claims = _decode(token)
+    if claims is None or claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+async def require_session(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Dependency: the claims of the "Authorization: Bearer <token>" from /api/auth/login"""
+    scheme, _, token = (authorization or "").partition(" ")
+    claims = verify_token(token) if scheme.lower() == "bearer" else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Missing or expired session token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+async def require_user(email: str, session: Dict[str, Any] = Depends(require_session)) -> Dict[str, Any]:
+    """Dependency for /.../{email} routes: the token must belong to that email (in any letter case)"""
+    if session["sub"] != await db.resolve_email(email):
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
+    return session
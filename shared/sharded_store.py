@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+import threading
+import zlib
+from typing import Dict, Any, Optional, List
+
+from shared.user_store import UserStore
+
+
+def shard_index(email: str, shard_count: int) -> int:
+    """Stable shard routing: the same email maps to the same shard in every process"""
+    return zlib.crc32(email.encode('utf-8')) % shard_count
+
+
+def shard_path(base_path: str, index: int, shard_count: int) -> str:
+    """users.json -> users.00.json ... users.63.json"""
+    root, ext = os.path.splitext(base_path)
+    width = max(2, len(str(shard_count - 1)))
+    return f"{root}.{index:0{width}d}{ext}"
+
+
+def manifest_path(base_path: str) -> str:
+    root, _ = os.path.splitext(base_path)
+    return f"{root}.shards"
+
+
+def read_manifest(base_path: str) -> Optional[Dict[str, Any]]:
+    path = manifest_path(base_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(base_path: str, manifest: Dict[str, Any]):
+    path = manifest_path(base_path)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+class ShardedUserStore:
+    """Users split across `shard_count` JSON files by a stable hash of the email.
+
+    Each shard is an independent UserStore with its own lock and its own
+    file, loaded the first time one of its users is touched. A write rewrites
+    only its shard (about 1/N of the data) and writers on different shards
+    never contend. With `multiprocess=True` every shard takes its own
+    advisory file lock, so processes only contend on the same shard.
+    The shard count is recorded in `users.shards`; use `reshard` to change it.
+    """
+
+    def __init__(self, base_path: str, shard_count: int, durability: str = "write_behind",
+                 flush_interval: float = 1.0, multiprocess: bool = False, group_window: float = 0.005,
+                 group_max_batch: int = 64):
+        manifest = read_manifest(base_path)
+        if manifest is None:
+            split_json_into_shards(base_path, shard_count)
+        elif "resharding_to" in manifest:
+            raise ValueError(f"Resharding of {base_path} was interrupted; "
+                             f"run python -m shared.sharded_store {base_path} {manifest['resharding_to']}")
+        elif manifest["shards"] != shard_count:
+            raise ValueError(f"{base_path} is split into {manifest['shards']} shards, not {shard_count}; "
+                             f"run python -m shared.sharded_store {base_path} {shard_count}")
+        self.base_path = base_path
+        self.shard_count = shard_count
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.multiprocess = multiprocess
+        self.group_window = group_window
+        self.group_max_batch = group_max_batch
+        self._shards: List[Optional[UserStore]] = [None] * shard_count
+        self._open_lock = threading.Lock()
+
+    def _shard(self, index: int) -> UserStore:
+        shard = self._shards[index]
+        if shard is None:
+            with self._open_lock:
+                shard = self._shards[index]
+                if shard is None:
+                    shard = UserStore(shard_path(self.base_path, index, self.shard_count),
+                                      durability=self.durability, flush_interval=self.flush_interval,
+                                      multiprocess=self.multiprocess, group_window=self.group_window,
+                                      group_max_batch=self.group_max_batch)
+                    self._shards[index] = shard
+        return shard
+
+    @property
+    def loads(self) -> int:
+        """Times any open shard (re)parsed its file"""
+        return sum(shard.loads for shard in self._shards if shard is not None)
+
+    def _shard_for(self, email: str) -> UserStore:
+        return self._shard(shard_index(email, self.shard_count))
+
+    def flush(self) -> bool:
+        return all(shard.flush() for shard in self._shards if shard is not None)
+
+    def close(self):
+        for shard in self._shards:
+            if shard is not None:
+                shard.close()
+
+    # Record access
+    def all(self) -> Dict[str, Any]:
+        users = {}
+        for index in range(self.shard_count):
+            users.update(self._shard(index).all())
+        return users
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._shard_for(email).get(email)
+
+    def replace_all(self, users_data: Dict[str, Any]) -> bool:
+        buckets = [{} for _ in range(self.shard_count)]
+        for email, data in users_data.items():
+            buckets[shard_index(email, self.shard_count)][email] = data
+        return all([self._shard(index).replace_all(bucket) for index, bucket in enumerate(buckets)])
+
+    def emails(self) -> List[str]:
+        return [email for index in range(self.shard_count) for email in self._shard(index).emails()]
+
+    def version(self, email: str) -> Optional[int]:
+        return self._shard_for(email).version(email)
+
+    def update(self, email: str, user_data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        return self._shard_for(email).update(email, user_data, expected_version)
+
+    def patch(self, email: str, changes: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        return self._shard_for(email).patch(email, changes, expected_version)
+
+    def create(self, email: str, user_data: Dict[str, Any]) -> bool:
+        return self._shard_for(email).create(email, user_data)
+
+    def patch_many(self, changes_by_email: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Patch several users with one write per shard touched"""
+        buckets = {}
+        for email, changes in changes_by_email.items():
+            buckets.setdefault(shard_index(email, self.shard_count), {})[email] = changes
+        patched = {}
+        for index, bucket in buckets.items():
+            patched.update(self._shard(index).patch_many(bucket))
+        return {email: patched[email] for email in changes_by_email}
+
+    def create_many(self, users_data: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Create several users with one write per shard touched"""
+        buckets = {}
+        for email, data in users_data.items():
+            buckets.setdefault(shard_index(email, self.shard_count), {})[email] = data
+        created = {}
+        for index, bucket in buckets.items():
+            created.update(self._shard(index).create_many(bucket))
+        return {email: created[email] for email in users_data}
+
+
+def _write_shards(base_path: str, users: Dict[str, Any], shard_count: int):
+    buckets = [{} for _ in range(shard_count)]
+    for email, data in users.items():
+        buckets[shard_index(email, shard_count)][email] = data
+    for index, bucket in enumerate(buckets):
+        path = shard_path(base_path, index, shard_count)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(bucket, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+
+def split_json_into_shards(base_path: str, shard_count: int):
+    """First start in sharded mode: distribute the existing users.json (if any) into shards"""
+    users = {}
+    if os.path.exists(base_path):
+        with open(base_path, 'r') as f:
+            users = json.load(f)
+    _write_shards(base_path, users, shard_count)
+    write_manifest(base_path, {"shards": shard_count})
+
+
+def _staging_base(base_path: str) -> str:
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.reshard{ext}"
+
+
+def _finish_reshard(base_path: str, old_count: int, new_count: int):
+    """Move staged shards into place, switch the manifest and drop leftover old shards.
+
+    Every step is idempotent, so an interrupted run is completed by running it again.
+    """
+    staging = _staging_base(base_path)
+    for index in range(new_count):
+        staged = shard_path(staging, index, new_count)
+        if os.path.exists(staged):
+            os.replace(staged, shard_path(base_path, index, new_count))
+    write_manifest(base_path, {"shards": new_count})
+
+    new_paths = {shard_path(base_path, index, new_count) for index in range(new_count)}
+    for index in range(old_count):
+        path = shard_path(base_path, index, old_count)
+        if path not in new_paths and os.path.exists(path):
+            os.remove(path)
+
+
+def reshard(base_path: str, new_count: int) -> int:
+    """Redistribute users into `new_count` shards; run while the API is stopped.
+
+    The new layout is written under a staging name first and the manifest
+    records the move in progress, so a crash at any point either leaves the
+    old layout untouched or is completed by running reshard again.
+    Returns the number of users redistributed.
+    """
+    manifest = read_manifest(base_path)
+    if manifest is None:
+        raise ValueError(f"{base_path} is not sharded yet")
+    if "resharding_to" in manifest:
+        if manifest["resharding_to"] != new_count:
+            raise ValueError(f"Finish the interrupted reshard to {manifest['resharding_to']} shards first")
+        _finish_reshard(base_path, manifest["shards"], new_count)
+        return 0
+    old_count = manifest["shards"]
+    if old_count == new_count:
+        return 0
+
+    users = {}
+    for index in range(old_count):
+        path = shard_path(base_path, index, old_count)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                users.update(json.load(f))
+
+    _write_shards(_staging_base(base_path), users, new_count)
+    write_manifest(base_path, {"shards": old_count, "resharding_to": new_count})
+    _finish_reshard(base_path, old_count, new_count)
+    return len(users)
+
+
+if __name__ == "__main__":
+    # python -m shared.sharded_store users.json 128
+    base, count = sys.argv[1], int(sys.argv[2])
+    print(f"Moved {reshard(base, count)} users into {count} shards")
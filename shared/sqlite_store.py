@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+from shared.user_store import VERSION_KEY, VersionConflict, split_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class SqliteUserStore:
+    """User store backed by SQLite in WAL mode, one row per user keyed by email.
+
+    SQLite's own locking makes the store safe to share between processes;
+    compare-and-swap updates are a conditional UPDATE on the record version.
+    Each thread gets its own connection from a small per-thread pool, so
+    readers never wait on each other and WAL lets them run alongside a writer.
+    Durability "sync" and "group" map to synchronous=FULL (SQLite batches
+    concurrent WAL commits itself), "write_behind" to NORMAL (safe across
+    process crashes, may drop the last commits on power loss).
+    """
+
+    def __init__(self, path: str, durability: str = "write_behind"):
+        self.path = path
+        self.synchronous = "NORMAL" if durability == "write_behind" else "FULL"
+        self._local = threading.local()
+        self._connections = []
+        self._pool_lock = threading.Lock()
+        self._conn().execute(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            with self._pool_lock:
+                self._connections.append(conn)
+        return conn
+
+    def flush(self) -> bool:
+        # Every write is its own committed transaction
+        return True
+
+    def close(self):
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    # Record access
+    def all(self) -> Dict[str, Any]:
+        rows = self._conn().execute("SELECT email, data FROM users").fetchall()
+        return {email: json.loads(data) for email, data in rows}
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT data FROM users WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def emails(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT email FROM users")]
+
+    def version(self, email: str) -> Optional[int]:
+        row = self._conn().execute(f"SELECT COALESCE(json_extract(data, '$.{VERSION_KEY}'), 0) FROM users "
+                                   "WHERE email = ?", (email,)).fetchone()
+        return row[0] if row else None
+
+    def replace_all(self, users_data: Dict[str, Any]) -> bool:
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM users")
+            conn.executemany("INSERT INTO users (email, data) VALUES (?, ?)",
+                             ((email, json.dumps(data)) for email, data in users_data.items()))
+            conn.execute("COMMIT")
+            return True
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            print(f"Error saving users: {e}")
+            return False
+
+    def _set_paths(self, email: str, changes: List[Tuple[List[str], Any]], expected_version: Optional[int]) -> bool:
+        """Single-row UPDATE that json_set()s each (keys, value) pair and bumps the version"""
+        version = f"COALESCE(json_extract(data, '$.{VERSION_KEY}'), 0)"
+        paths = [f"'$.{VERSION_KEY}', {version} + 1"]
+        params = []
+        for keys, value in changes:
+            if keys == [VERSION_KEY]:
+                continue
+            paths.append("?, json(?)")
+            params.extend(["$" + "".join(f'."{key}"' for key in keys), json.dumps(value)])
+        sql = f"UPDATE users SET data = json_set(data, {', '.join(paths)}) WHERE email = ?"
+        params.append(email)
+        if expected_version is not None:
+            sql += f" AND {version} = ?"
+            params.append(expected_version)
+        try:
+            cursor = self._conn().execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"Error saving users: {e}")
+            return False
+        if cursor.rowcount == 1:
+            return True
+        if expected_version is not None and self.get(email) is not None:
+            raise VersionConflict(email)
+        return False
+
+    def update(self, email: str, user_data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Merge user_data into the record; raise VersionConflict if expected_version is stale"""
+        # Top-level keys are replaced, like dict.update on the JSON backend
+        return self._set_paths(email, [([key], value) for key, value in user_data.items()], expected_version)
+
+    def patch(self, email: str, changes: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Set only the given dotted paths, e.g. {"health_data.overall_score": 80}"""
+        return self._set_paths(email, [(split_path(path), value) for path, value in changes.items()],
+                               expected_version)
+
+    def patch_many(self, changes_by_email: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Patch several users in one transaction; email -> False if the user is missing"""
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            patched = {email: self.patch(email, changes) for email, changes in changes_by_email.items()}
+            conn.execute("COMMIT")
+            return patched
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            print(f"Error saving users: {e}")
+            return {email: False for email in changes_by_email}
+
+    def create(self, email: str, user_data: Dict[str, Any]) -> bool:
+        record = dict(user_data)
+        record[VERSION_KEY] = 1
+        try:
+            cursor = self._conn().execute("INSERT OR IGNORE INTO users (email, data) VALUES (?, ?)",
+                                          (email, json.dumps(record)))
+            return cursor.rowcount == 1  # 0 when the user already exists
+        except sqlite3.Error as e:
+            print(f"Error saving users: {e}")
+            return False
+
+    def create_many(self, users_data: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Create several users in one transaction; email -> False if it already existed"""
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            created = {}
+            for email, user_data in users_data.items():
+                record = dict(user_data)
+                record[VERSION_KEY] = 1
+                cursor = conn.execute("INSERT OR IGNORE INTO users (email, data) VALUES (?, ?)",
+                                      (email, json.dumps(record)))
+                created[email] = cursor.rowcount == 1
+            conn.execute("COMMIT")
+            return created
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK")
+            print(f"Error saving users: {e}")
+            return {email: False for email in users_data}
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """One-shot import of users.json into an empty SQLite database; returns rows imported"""
+    store = SqliteUserStore(db_path)
+    try:
+        if store._conn().execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            print(f"{db_path} already has users, skipping migration")
+            return 0
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, 'r') as f:
+            users = json.load(f)
+        if not store.replace_all(users):
+            raise RuntimeError(f"Failed to import {json_path} into {db_path}")
+        return len(users)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    # python -m shared.sqlite_store users.json users.db
+    source, target = sys.argv[1:3] if len(sys.argv) >= 3 else ("users.json", "users.db")
+    print(f"Imported {migrate_json_to_sqlite(source, target)} users from {source} into {target}")
@@ -0,0 +1,142 @@
+import contextlib
+import copy
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import streamlit as st
+
+from shared.database import USERS_STORAGE
+from shared.user_store import VERSION_KEY, FileLock, apply_patch, fcntl
+
+# users.json in the main API folder, shared with the FastAPI backend
+USERS_FILE = Path(__file__).parent.parent / "users.json"
+
+
+class UserFileCache:
+    """Parsed users.json shared by every Streamlit session of this process.
+
+    Streamlit reruns a page script on each widget interaction, so the file
+    is only re-parsed when its (inode, mtime, size) stamp changes. Writes
+    made here refresh the stamp themselves and hold `<path>.lock`, which the
+    API's json store also holds while flushing (and, in multi-process
+    mode, for every operation), so file writes never interleave. The API
+    merges the file into memory per record before each flush: if a page
+    and the API change the same user within one write-behind interval,
+    the API's version of that record wins.
+
+    Only the plain "json" backend keeps every user in users.json (and
+    re-reads it when the pages replace it), so the pages refuse to run
+    against any other USERS_STORAGE.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{path}.lock") if fcntl is not None else None
+        self._stamp = None
+        self._users: Dict[str, Any] = {}
+        self.loads = 0
+
+    def _stat(self):
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return info.st_ino, info.st_mtime_ns, info.st_size
+
+    @contextlib.contextmanager
+    def _locked(self, shared: bool = False):
+        with self._lock:
+            if self._file_lock is None:
+                self._revalidate()
+                yield
+            else:
+                with self._file_lock.hold(shared=shared):
+                    self._revalidate()
+                    yield
+
+    def _revalidate(self):
+        stamp = self._stat()
+        if stamp is not None and stamp == self._stamp:
+            return
+        users = {}
+        if stamp is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            users = json.loads(content) if content else {}
+        self._users, self._stamp = users, stamp
+        self.loads += 1
+
+    def _write(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self._users, indent=4))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            self._stamp = None  # in-memory copy is ahead of the file: reload next time
+            raise
+        self._stamp = self._stat()
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._locked(shared=True):
+            return copy.deepcopy(self._users.get(email))
+
+    def create(self, email: str, user_data: Dict[str, Any]) -> bool:
+        with self._locked():
+            if email in self._users:
+                return False
+            record = copy.deepcopy(user_data)
+            record[VERSION_KEY] = 1
+            self._users[email] = record
+            self._write()
+            return True
+
+    def patch(self, email: str, changes: Dict[str, Any]) -> bool:
+        with self._locked():
+            record = self._users.get(email)
+            if record is None:
+                return False
+            apply_patch(record, copy.deepcopy(changes))
+            record[VERSION_KEY] = record.get(VERSION_KEY, 0) + 1
+            self._write()
+            return True
+
+
+@st.cache_resource
+def _user_cache(path: str) -> UserFileCache:
+    if USERS_STORAGE != "json":
+        raise RuntimeError(f"the Streamlit pages only support USERS_STORAGE=json, not {USERS_STORAGE}")
+    return UserFileCache(path)
+
+
+def get_user(email: str) -> Optional[Dict[str, Any]]:
+    """Get a specific user by email (None if missing or unreadable)"""
+    try:
+        return _user_cache(str(USERS_FILE)).get(email)
+    except Exception as e:
+        st.error(f"❌ Error loading users: {e}")
+        return None
+
+
+def create_user(email: str, user_data: Dict[str, Any]) -> bool:
+    """Create a new user; False if the email is taken or the write failed"""
+    try:
+        return _user_cache(str(USERS_FILE)).create(email, user_data)
+    except Exception as e:
+        st.error(f"❌ Error saving users: {e}")
+        return False
+
+
+def patch_user(email: str, changes: Dict[str, Any]) -> bool:
+    """Set only the given fields; nested fields use dotted paths ("health_data.overall_score")"""
+    try:
+        return _user_cache(str(USERS_FILE)).patch(email, changes)
+    except Exception as e:
+        st.error(f"❌ Error saving users: {e}")
+        return False
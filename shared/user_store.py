@@ -0,0 +1,410 @@
+import contextlib
+import copy
+import json
+import os
+import threading
+from typing import Dict, Any, Optional, List
+
+from shared.group_commit import GroupCommitter
+
+try:
+    import fcntl
+except ImportError:  # Windows: multi-process mode is unavailable
+    fcntl = None
+
+# "sync": every write is on disk before the call returns
+# "write_behind": writes land in memory and a background thread flushes them
+# "group": like sync, but concurrent writers wait for one shared flush
+DURABILITY_MODES = ("sync", "write_behind", "group")
+
+# Per-record counter bumped on every create/update, used for compare-and-swap
+VERSION_KEY = "_version"
+
+# _write_snapshot(): replace the file whatever its current stamp
+_UNCHECKED = object()
+
+
+class VersionConflict(Exception):
+    """The record changed since it was read (expected_version no longer matches)"""
+
+
+def split_path(path: str):
+    """"health_data.overall_score" -> ["health_data", "overall_score"]"""
+    return path.split(".")
+
+
+def apply_patch(record: Dict[str, Any], changes: Dict[str, Any]):
+    """Set each dotted path in `changes` on record.
+
+    Missing intermediate dicts are created; a path running through a value
+    that is not a dict is skipped (the same rules as SQLite's json_set).
+    """
+    for path, value in changes.items():
+        keys = split_path(path)
+        target = record
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+            if not isinstance(target, dict):
+                break
+        else:
+            target[keys[-1]] = value
+
+
+class FileLock:
+    """Advisory lock shared by every process that opens the same store (fcntl.flock)"""
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("Multi-process storage needs fcntl.flock, which this platform lacks")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextlib.contextmanager
+    def hold(self, shared: bool = False):
+        fcntl.flock(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class UserStore:
+    """Users kept in an in-memory dict keyed by email, persisted to a JSON file.
+
+    The file is parsed when the store is created. Reads are served from
+    memory; writes are flushed either immediately or by a background flusher
+    at most `flush_interval` seconds after the first unflushed change.
+    Every access compares the file's (inode, mtime, size) stamp with the
+    last one loaded or written, so a file replaced by another writer (such
+    as the Streamlit pages) is re-parsed, with this store's unflushed
+    records kept on top. Flushes do the same merge while holding the
+    advisory lock on `<path>.lock` that the pages take for their writes,
+    so neither side overwrites the other's changes.
+    In "group" mode writers block until durable, but all writes arriving within
+    `group_window` seconds (or `group_max_batch` of them) share one flush.
+
+    With `multiprocess=True` several processes may share the file: every
+    operation holds an advisory lock on `<path>.lock`, reloads the file if
+    another process replaced it, and writes go to disk before the lock is
+    released (durability is effectively "sync").
+    """
+
+    def __init__(self, path: str, durability: str = "write_behind", flush_interval: float = 1.0,
+                 multiprocess: bool = False, group_window: float = 0.005, group_max_batch: int = 64):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.path = path
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.multiprocess = multiprocess
+
+        self._lock = threading.RLock()      # guards self._users
+        self._io_lock = threading.Lock()    # keeps snapshots hitting disk in order
+        self._file_lock = FileLock(f"{path}.lock") if multiprocess else None
+        # Single process: held only while flushing, to serialize with other writers of the file
+        self._flush_file_lock = (FileLock(f"{path}.lock")
+                                 if not multiprocess and fcntl is not None and self._watches_file() else None)
+        self._disk_state = None             # identity of the snapshot last loaded or written
+        self._dirty = False
+        self._unflushed = set()             # emails changed since the last snapshot (None: replace_all)
+        self._flushing = set()              # emails in the snapshot being written
+        self.loads = 0                      # times the file was (re)parsed
+        with self._lock, self._locked_file():
+            self._users = self._load()
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+        if self._wants_flusher():
+            self._flusher = threading.Thread(target=self._flush_loop, name="users-flusher", daemon=True)
+            self._flusher.start()
+        self._committer = None
+        if durability == "group":
+            self._committer = GroupCommitter(self.flush, window=group_window, max_batch=group_max_batch)
+
+    def _wants_flusher(self) -> bool:
+        return self.durability == "write_behind" and not self.multiprocess
+
+    def _watches_file(self) -> bool:
+        """Whether every access checks the file for writes made outside this store"""
+        return True
+
+    # Loading / persistence
+    def _stat(self, path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load(self) -> Dict[str, Any]:
+        self.loads += 1
+        self._disk_state = self._stat(self.path)
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading users: {e}")
+        return {}
+
+    def _refresh(self):
+        """Pick up changes other processes made (called holding both locks)"""
+        if self._stat(self.path) == self._disk_state:
+            return
+        users = self._load()
+        if self._unflushed is None or self._flushing is None:
+            return  # a pending replace_all supersedes the file
+        for email in self._unflushed | self._flushing:
+            if email in self._users:
+                users[email] = self._users[email]
+        self._users = users
+
+    def _write_snapshot(self, payload: str, expected_stamp=_UNCHECKED):
+        """Atomically replace the users file so a crash never leaves it half written.
+
+        Returns the stamp of the new file (a rename keeps inode and mtime),
+        or None without replacing anything if the file's stamp is no longer
+        `expected_stamp`.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        if expected_stamp is not _UNCHECKED and self._stat(self.path) != expected_stamp:
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, self.path)
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _requeue_flushing(self):
+        """A snapshot was not written: its records are unflushed again (called under self._lock)"""
+        self._dirty = True
+        if self._flushing is None or self._unflushed is None:
+            self._unflushed = None
+        else:
+            self._unflushed |= self._flushing
+        self._flushing = set()
+
+    @contextlib.contextmanager
+    def _flushing_file(self):
+        if self._flush_file_lock is None:
+            yield
+        else:
+            with self._flush_file_lock.hold():
+                yield
+
+    def flush(self) -> bool:
+        """Write pending changes to disk, merged with whatever another writer put in the file"""
+        with self._io_lock, self._flushing_file():
+            while True:
+                with self._lock:
+                    expected_stamp = _UNCHECKED
+                    if self._flush_file_lock is not None:
+                        self._refresh()
+                        expected_stamp = self._disk_state
+                    if not self._dirty:
+                        return True
+                    payload = json.dumps(self._users, indent=4)
+                    self._dirty = False
+                    self._flushing, self._unflushed = self._unflushed, set()
+                try:
+                    stamp = self._write_snapshot(payload, expected_stamp)
+                except Exception as e:
+                    print(f"Error saving users: {e}")
+                    with self._lock:
+                        self._requeue_flushing()
+                    return False
+                with self._lock:
+                    if stamp is None:
+                        # Replaced by a writer ignoring the lock: merge its file and try again
+                        self._requeue_flushing()
+                        continue
+                    self._disk_state = stamp
+                    self._flushing = set()
+                    return True
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            # Let writes arriving within the window share one flush
+            self._stop.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _record(self, op: str, email: Optional[str], data: Any):
+        """Note a change that was just applied in memory (called under self._lock)"""
+        self._dirty = True
+        if op == "replace":
+            self._unflushed = None
+        elif self._unflushed is not None:
+            self._unflushed.add(email)
+
+    def _persist(self) -> bool:
+        """Persist changes already applied in memory, per the durability mode.
+
+        Must be called without holding self._lock.
+        """
+        if self.durability == "sync":
+            return self.flush()
+        if self.durability == "group":
+            return self._committer.commit()
+        self._wakeup.set()
+        return True
+
+    def _publish(self) -> bool:
+        """Multi-process mode: write the change while the file lock is still held"""
+        try:
+            self._disk_state = self._write_snapshot(json.dumps(self._users, indent=4))
+            self._dirty = False
+            self._unflushed = set()
+            return True
+        except Exception as e:
+            print(f"Error saving users: {e}")
+            self._disk_state = False  # never matches a stat: reload on next access
+            self._unflushed = set()  # the failed change is dropped by that reload
+            return False
+
+    def close(self):
+        """Stop the background flusher and write anything still pending"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        if self._committer is not None:
+            self._committer.close()
+            self._committer = None
+        self.flush()
+        for lock in (self._file_lock, self._flush_file_lock):
+            if lock is not None:
+                lock.close()
+        self._file_lock = self._flush_file_lock = None
+
+    # Locking
+    @contextlib.contextmanager
+    def _locked_file(self, shared: bool = False):
+        if self._file_lock is None:
+            yield
+        else:
+            with self._file_lock.hold(shared=shared):
+                yield
+
+    @contextlib.contextmanager
+    def _reading(self):
+        with self._lock, self._locked_file(shared=True):
+            if self._watches_file():
+                self._refresh()
+            yield
+
+    def _mutate(self, op: str, email: Optional[str], data: Any, expected_version: Optional[int] = None) -> bool:
+        return self._write(lambda: self._apply(op, email, data, expected_version))
+
+    def _write(self, apply) -> bool:
+        """Run apply() (True if it changed anything) under the locks, then persist once"""
+        with self._lock, self._locked_file():
+            if self._watches_file():
+                self._refresh()
+            if not apply():
+                return False
+            if self.multiprocess:
+                # Other processes must see the change before the lock is released
+                if not self._publish():
+                    return False
+                if not self._dirty:
+                    return True  # already durable
+        return self._persist()
+
+    def _apply(self, op: str, email: Optional[str], data: Any, expected_version: Optional[int]) -> bool:
+        if op == "replace":
+            self._users = copy.deepcopy(data)
+            self._record("replace", None, data)
+            return True
+
+        current = self._users.get(email)
+        if op == "create":
+            if current is not None:
+                return False  # User already exists
+            record = copy.deepcopy(data)
+            record[VERSION_KEY] = 1
+            self._users[email] = record
+            self._record("create", email, record)
+            return True
+
+        if current is None:
+            return False
+        if expected_version is not None and current.get(VERSION_KEY, 0) != expected_version:
+            raise VersionConflict(email)
+        changes = copy.deepcopy(data)
+        changes[VERSION_KEY] = current.get(VERSION_KEY, 0) + 1
+        if op == "patch":
+            apply_patch(current, changes)
+        else:
+            current.update(changes)
+        self._record(op, email, changes)
+        return True
+
+    # Record access
+    def all(self) -> Dict[str, Any]:
+        with self._reading():
+            return copy.deepcopy(self._users)
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self._reading():
+            return copy.deepcopy(self._users.get(email))
+
+    def emails(self) -> List[str]:
+        """Every stored email (record keys only, nothing is copied)"""
+        with self._reading():
+            return list(self._users)
+
+    def version(self, email: str) -> Optional[int]:
+        """The record's current version without copying it (None if the user is missing)"""
+        with self._reading():
+            record = self._users.get(email)
+            return None if record is None else record.get(VERSION_KEY, 0)
+
+    def replace_all(self, users_data: Dict[str, Any]) -> bool:
+        return self._mutate("replace", None, users_data)
+
+    def update(self, email: str, user_data: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Merge user_data into the record; raise VersionConflict if expected_version is stale"""
+        return self._mutate("update", email, user_data, expected_version)
+
+    def patch(self, email: str, changes: Dict[str, Any], expected_version: Optional[int] = None) -> bool:
+        """Set only the given dotted paths, e.g. {"last_login": ..., "health_data.overall_score": 80}"""
+        return self._mutate("patch", email, changes, expected_version)
+
+    def patch_many(self, changes_by_email: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Patch several users with a single write; email -> False if the user is missing"""
+        patched = {}
+
+        def apply():
+            for email, changes in changes_by_email.items():
+                patched[email] = self._apply("patch", email, changes, None)
+            return any(patched.values())
+
+        if not self._write(apply):
+            return {email: False for email in changes_by_email}
+        return patched
+
+    def create(self, email: str, user_data: Dict[str, Any]) -> bool:
+        return self._mutate("create", email, user_data)
+
+    def create_many(self, users_data: Dict[str, Dict[str, Any]]) -> Dict[str, bool]:
+        """Create several users with a single write; email -> False if it already existed"""
+        created = {}
+
+        def apply():
+            for email, user_data in users_data.items():
+                created[email] = self._apply("create", email, user_data, None)
+            return any(created.values())
+
+        if not self._write(apply):
+            return {email: False for email in users_data}
+        return created
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from shared.binary_store import BinaryUserStore, HEADER, heap_path
+
+
+def user(n):
+    return {"username": f"u{n}", "age": 30 + n, "weight": 70.5, "health_data": {"overall_score": n}}
+
+
+@pytest.fixture
+def base(tmp_path):
+    return str(tmp_path / "users")
+
+
+def mapped_count(base):
+    with open(f"{base}.rec", 'rb') as f:
+        return HEADER.unpack(f.read(HEADER.size))[2]
+
+
+def test_records_reach_the_mapping_only_at_flush(base):
+    store = BinaryUserStore(base, flush_interval=60)
+    store.create("a@x.com", user(1))
+    store.patch("a@x.com", {"health_data.overall_score": 90, "username": "ann"})
+    assert store.get("a@x.com")["username"] == "ann"
+    assert store.get_numbers("a@x.com")["health_data.overall_score"] == 90
+    assert mapped_count(base) == 0  # nothing the kernel could write back ahead of the heap
+
+    store.flush()
+    assert mapped_count(base) == 1
+    store.close()
+    reopened = BinaryUserStore(base, durability="sync")
+    assert reopened.get("a@x.com")["username"] == "ann"
+    reopened.close()
+
+
+def test_compaction_and_replace_all_keep_pending_changes(base):
+    store = BinaryUserStore(base, durability="sync")
+    store.create_many({f"{n}@x.com": user(n) for n in range(50)})
+    store.compact()
+    store.patch("3@x.com", {"username": "changed"})
+    store.replace_all({**store.all(), "new@x.com": user(99)})
+    assert store.get("3@x.com")["username"] == "changed"
+    assert len(store.emails()) == 51
+    store.close()
+
+
+def test_open_rejects_records_pointing_past_the_heap(base):
+    store = BinaryUserStore(base, durability="sync")
+    store.create("a@x.com", user(1))
+    store.close()
+    path = heap_path(base, 0)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)
+    with pytest.raises(ValueError, match="points past the end"):
+        BinaryUserStore(base)
@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from chatbot import chatbot_api
+from shared.llm_client import LLMClient, LLMError
+from shared.semantic_cache import SemanticCache
+
+ANSWER = {"candidates": [{"content": {"parts": [{"text": "Spinach, lentils and red meat."}]}}]}
+
+
+class SlowGemini:
+    """Mock transport handler answering after `delay` seconds, counting calls and cancellations"""
+
+    def __init__(self, status: int = 200, delay: float = 0.05):
+        self.status = status
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return httpx.Response(self.status, json=ANSWER if self.status == 200 else {})
+
+
+def client(gemini: SlowGemini) -> LLMClient:
+    return LLMClient(api_key="test", transport=httpx.MockTransport(gemini))
+
+
+def test_concurrent_chat_requests_share_one_upstream_call(monkeypatch):
+    gemini = SlowGemini()
+    llm = client(gemini)
+    monkeypatch.setattr(chatbot_api, "llm", llm)
+    monkeypatch.setattr(chatbot_api, "semantic_cache", SemanticCache())
+    app = FastAPI()
+    app.include_router(chatbot_api.router, prefix="/api/chatbot")
+
+    async def chat_100():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            responses = await asyncio.gather(*(
+                http.post("/api/chatbot/chat", json={"message": "Which foods are rich in iron?"})
+                for _ in range(100)))
+        await llm.close()
+        return responses
+
+    responses = asyncio.run(chat_100())
+    assert all(r.status_code == 200 and r.json()["success"] for r in responses)
+    assert gemini.calls == 1
+    assert llm.stats == {"upstream": 1, "coalesced": 99}
+
+
+def test_upstream_error_reaches_every_waiter():
+    gemini = SlowGemini(status=500)
+    llm = client(gemini)
+
+    async def generate_10():
+        results = await asyncio.gather(*(llm.generate("same prompt") for _ in range(10)), return_exceptions=True)
+        await llm.close()
+        return results
+
+    results = asyncio.run(generate_10())
+    assert gemini.calls == 1
+    assert all(isinstance(result, LLMError) for result in results)
+    assert not llm._inflight
+
+
+def test_cancelling_every_waiter_cancels_the_upstream_call():
+    gemini = SlowGemini(delay=10)
+    llm = client(gemini)
+
+    async def cancel_all_then_retry():
+        waiters = [asyncio.ensure_future(llm.generate("same prompt")) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert not llm._inflight
+        gemini.delay = 0
+        text = await llm.generate("same prompt")
+        await llm.close()
+        return waiters, text
+
+    waiters, text = asyncio.run(cancel_all_then_retry())
+    assert all(waiter.cancelled() for waiter in waiters)
+    assert gemini.cancelled == 1
+    assert gemini.calls == 2
+    assert text == "Spinach, lentils and red meat."
+
+
+
+def test_missing_api_key_fails_only_the_call():
+    llm = LLMClient(api_key="")
+
+    async def start_then_generate():
+        await llm.start()  # the app still starts
+        await llm.generate("prompt")
+
+    with pytest.raises(LLMError, match="GEMINI_API_KEY is not set"):
+        asyncio.run(start_then_generate())
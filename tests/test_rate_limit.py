@@ -0,0 +1,17 @@
+from shared.rate_limit import TokenBuckets
+
+
+def test_bucket_refuses_then_refills():
+    buckets = TokenBuckets(capacity=2, rate=1)
+    assert [buckets.take("a", now=0) for _ in range(3)] == [0.0, 0.0, 1.0]
+    assert buckets.take("a", now=1) == 0.0
+
+
+def test_table_is_bounded_and_drops_least_recently_seen():
+    buckets = TokenBuckets(capacity=1, rate=0.01, max_keys=100)
+    buckets.take("victim", now=0)
+    for i in range(1000):
+        buckets.take(f"attacker{i}", now=0)
+        buckets.take("victim", now=0)  # refused, but keeps the victim's bucket recent
+    assert len(buckets) == 100
+    assert buckets.take("victim", now=0) > 0
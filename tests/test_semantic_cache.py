@@ -0,0 +1,40 @@
+import pytest
+
+from shared.semantic_cache import SemanticCache, qualifiers
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(threshold=0.9)
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("I have no chest pain", "I have chest pain"),
+    ("I don't have a fever", "I have a fever"),
+    ("What should I eat with diabetes type two?", "What should I eat with diabetes type one?"),
+    ("Pain in my left arm", "Pain in my right arm"),
+    ("Fever for 3 days", "Fever for 5 days"),
+])
+def test_differently_qualified_questions_miss(cache, cached, asked):
+    cache.add("general", cached, "answer")
+    assert cache.lookup("general", asked) is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What should I eat with diabetes type two?", "what should i eat with diabetes type two"),
+    ("I have no chest pain", "I have no chest pain!"),
+    ("Pain in my left arm", "pain in my left arm?"),
+])
+def test_rephrased_questions_hit(cache, cached, asked):
+    cache.add("general", cached, "answer")
+    assert cache.lookup("general", asked) == "answer"
+
+
+def test_scopes_are_separate(cache):
+    cache.add("symptom", "I have a headache", "answer")
+    assert cache.lookup("general", "I have a headache") is None
+
+
+def test_qualifiers_normalize_negations():
+    assert qualifiers("I don't have no pain") == ("not", "not")
+    assert qualifiers("Type two, 2 times") == ("2", "two")
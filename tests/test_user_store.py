@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from shared.user_store import UserStore
+
+
+def write_externally(path, users):
+    """Replace the file the way the Streamlit pages do (temp file + rename)"""
+    tmp_path = f"{path}.ui.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(users, f)
+    os.replace(tmp_path, path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UserStore(str(tmp_path / "users.json"), flush_interval=60)
+    yield store
+    store.close()
+
+
+def test_external_users_are_visible_and_kept(store):
+    store.create("a@x.com", {"n": 1})
+    store.flush()
+    write_externally(store.path, {**store.all(), "ui@x.com": {"n": 2}})
+
+    assert store.get("ui@x.com") == {"n": 2}
+    store.create("b@x.com", {"n": 3})
+    store.flush()
+    with open(store.path) as f:
+        assert sorted(json.load(f)) == ["a@x.com", "b@x.com", "ui@x.com"]
+
+
+def test_flush_merges_a_write_made_inside_the_write_behind_window(store):
+    store.create("a@x.com", {"n": 1})
+    store.flush()
+    store.patch("a@x.com", {"n": 2})
+    with open(store.path) as f:
+        users = json.load(f)
+    write_externally(store.path, {**users, "b@x.com": {"n": 5}})
+
+    store.flush()
+    with open(store.path) as f:
+        users = json.load(f)
+    assert sorted(users) == ["a@x.com", "b@x.com"]
+    assert users["a@x.com"]["n"] == 2